@@ -0,0 +1,37 @@
+"""Add booking overlap exclusion constraint
+
+Revision ID: 3f1a9c7d2b84
+Revises: e9168fc5396a
+Create Date: 2026-10-18 10:12:41.508213
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1a9c7d2b84'
+down_revision: Union[str, Sequence[str], None] = 'e9168fc5396a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # btree_gist lets the GiST index handle the plain integer equality on resource_id
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    op.execute(
+        """
+        ALTER TABLE bookings
+        ADD CONSTRAINT bookings_no_overlap
+        EXCLUDE USING gist (resource_id WITH =, tstzrange(start_time, end_time) WITH &&)
+        WHERE (status = 'confirmed')
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("ALTER TABLE bookings DROP CONSTRAINT IF EXISTS bookings_no_overlap")
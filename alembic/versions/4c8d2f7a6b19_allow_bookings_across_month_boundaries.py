@@ -0,0 +1,146 @@
+"""Let bookings run past the end of their month, guard overlaps across partitions
+
+Revision ID: 4c8d2f7a6b19
+Revises: b7e4a2c9d318
+Create Date: 2026-10-18 21:14:07.530218
+
+A booking may now end up to SPILL after the end of the UTC month it starts in
+(see MAX_SPILL in app/db/partitions.py):
+
+- every partition's <name>_within_bounds CHECK moves from the month's upper
+  bound to upper bound + SPILL (added NOT VALID, then validated, so writes
+  are not blocked while the rows are checked)
+- the bookings_boundary_guard trigger rejects the overlaps the per-partition
+  exclusion constraints cannot see: a booking running into the next month
+  against that month's bookings (same SQL as BOUNDARY_GUARD_DDL)
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4c8d2f7a6b19'
+down_revision: Union[str, Sequence[str], None] = 'b7e4a2c9d318'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# MAX_SPILL at the time of writing
+SPILL = "7 days"
+
+
+def set_bounds_checks(spill: str) -> None:
+    """
+    Replace the bounds CHECK of every live partition with end_time <= upper bound + spill.
+    """
+    op.execute(
+        f"""
+        DO $$
+        DECLARE
+            part record;
+            hi timestamptz;
+        BEGIN
+            FOR part IN
+                SELECT c.relname FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = 'public.bookings'::regclass AND c.relname ~ '^bookings_p\\d{{4}}_\\d{{2}}$'
+            LOOP
+                hi := to_timestamp(substr(part.relname, 11), 'YYYY_MM') + interval '1 month';
+                EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', part.relname, part.relname || '_within_bounds');
+                EXECUTE format(
+                    'ALTER TABLE %I ADD CONSTRAINT %I CHECK (end_time <= %L) NOT VALID',
+                    part.relname, part.relname || '_within_bounds', hi + interval '{spill}'
+                );
+                EXECUTE format('ALTER TABLE %I VALIDATE CONSTRAINT %I', part.relname, part.relname || '_within_bounds');
+            END LOOP;
+        END $$
+        """
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Partition names are UTC months
+    op.execute("SET LOCAL TIME ZONE 'UTC'")
+
+    # 1. Room to run past the end of the month
+    set_bounds_checks(SPILL)
+
+    # 2. The guard for overlaps across a month boundary
+    op.execute(
+        f"""
+        CREATE FUNCTION bookings_boundary_guard() RETURNS trigger
+        LANGUAGE plpgsql
+        -- Month arithmetic on timestamptz follows the session's zone: pin it
+        SET TimeZone = 'UTC'
+        AS $$
+        DECLARE
+            lo timestamptz := date_trunc('month', NEW.start_time AT TIME ZONE 'UTC') AT TIME ZONE 'UTC';
+            hi timestamptz := lo + interval '1 month';
+            lo_key integer := (extract(year FROM lo AT TIME ZONE 'UTC') * 12 + extract(month FROM lo AT TIME ZONE 'UTC'))::integer;
+        BEGIN
+            IF NEW.status NOT IN ('confirmed', 'held') THEN
+                RETURN NEW;
+            END IF;
+            IF NEW.start_time < lo + interval '{SPILL}' THEN
+                PERFORM pg_advisory_xact_lock(NEW.resource_id, lo_key);
+                IF EXISTS (
+                    SELECT 1 FROM bookings b
+                    WHERE b.resource_id = NEW.resource_id
+                      AND b.status IN ('confirmed', 'held')
+                      AND b.start_time >= lo - interval '1 month' AND b.start_time < lo
+                      AND b.end_time > NEW.start_time
+                ) THEN
+                    RAISE EXCEPTION 'conflicting key value violates exclusion constraint "bookings_boundary_no_overlap"'
+                        USING ERRCODE = 'exclusion_violation', CONSTRAINT = 'bookings_boundary_no_overlap';
+                END IF;
+            END IF;
+            IF NEW.end_time > hi THEN
+                PERFORM pg_advisory_xact_lock(NEW.resource_id, lo_key + 1);
+                IF EXISTS (
+                    SELECT 1 FROM bookings b
+                    WHERE b.resource_id = NEW.resource_id
+                      AND b.status IN ('confirmed', 'held')
+                      AND b.start_time >= hi AND b.start_time < NEW.end_time
+                ) THEN
+                    RAISE EXCEPTION 'conflicting key value violates exclusion constraint "bookings_boundary_no_overlap"'
+                        USING ERRCODE = 'exclusion_violation', CONSTRAINT = 'bookings_boundary_no_overlap';
+                END IF;
+            END IF;
+            RETURN NEW;
+        END $$
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER bookings_boundary_guard
+        BEFORE INSERT OR UPDATE OF resource_id, start_time, end_time, status ON bookings
+        FOR EACH ROW EXECUTE FUNCTION bookings_boundary_guard()
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("SET LOCAL TIME ZONE 'UTC'")
+
+    # 1. The old bounds cannot hold a booking that runs past its month
+    op.execute(
+        """
+        DO $$
+        DECLARE crossing bigint;
+        BEGIN
+            SELECT count(*) INTO crossing FROM bookings
+            WHERE end_time > date_trunc('month', start_time) + interval '1 month';
+            IF crossing > 0 THEN
+                RAISE EXCEPTION '% booking(s) cross a month boundary (UTC); split or shorten them, then rerun', crossing;
+            END IF;
+        END $$
+        """
+    )
+
+    # 2. Back to bookings ending within their month, without the guard
+    op.execute("DROP TRIGGER bookings_boundary_guard ON bookings")
+    op.execute("DROP FUNCTION bookings_boundary_guard()")
+    set_bounds_checks("0 days")
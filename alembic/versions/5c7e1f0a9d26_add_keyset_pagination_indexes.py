@@ -0,0 +1,30 @@
+"""Add keyset pagination indexes on bookings
+
+Revision ID: 5c7e1f0a9d26
+Revises: 8b2e4d6f1a93
+Create Date: 2026-10-18 11:48:52.630174
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c7e1f0a9d26'
+down_revision: Union[str, Sequence[str], None] = '8b2e4d6f1a93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_bookings_start_time_id', 'bookings', ['start_time', 'id'], unique=False)
+    op.create_index('ix_bookings_user_id_start_time_id', 'bookings', ['user_id', 'start_time', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_bookings_user_id_start_time_id', table_name='bookings')
+    op.drop_index('ix_bookings_start_time_id', table_name='bookings')
@@ -0,0 +1,48 @@
+"""Add waitlist
+
+Revision ID: 6e2a8c4f0b13
+Revises: d81f3b6a9e47
+Create Date: 2026-10-18 14:26:55.103862
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e2a8c4f0b13'
+down_revision: Union[str, Sequence[str], None] = 'd81f3b6a9e47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('waitlist_entries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('resource_id', sa.Integer(), nullable=False),
+    sa.Column('booking_id', sa.Integer(), nullable=True),
+    sa.Column('start_time', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('end_time', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('priority', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('status', sa.String(), server_default='waiting', nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['booking_id'], ['bookings.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['resource_id'], ['resources.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_waitlist_entries_id'), 'waitlist_entries', ['id'], unique=False)
+    op.create_index(op.f('ix_waitlist_entries_user_id'), 'waitlist_entries', ['user_id'], unique=False)
+    op.create_index('ix_waitlist_entries_waiting', 'waitlist_entries', ['resource_id', 'start_time'], unique=False, postgresql_where=sa.text("status = 'waiting'"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_waitlist_entries_waiting', table_name='waitlist_entries', postgresql_where=sa.text("status = 'waiting'"))
+    op.drop_index(op.f('ix_waitlist_entries_user_id'), table_name='waitlist_entries')
+    op.drop_index(op.f('ix_waitlist_entries_id'), table_name='waitlist_entries')
+    op.drop_table('waitlist_entries')
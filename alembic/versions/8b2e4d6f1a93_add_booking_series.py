@@ -0,0 +1,45 @@
+"""Add booking series for recurring bookings
+
+Revision ID: 8b2e4d6f1a93
+Revises: 3f1a9c7d2b84
+Create Date: 2026-10-18 11:03:17.224915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b2e4d6f1a93'
+down_revision: Union[str, Sequence[str], None] = '3f1a9c7d2b84'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('booking_series',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('resource_id', sa.Integer(), nullable=False),
+    sa.Column('rrule', sa.String(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['resource_id'], ['resources.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_booking_series_id'), 'booking_series', ['id'], unique=False)
+    op.add_column('bookings', sa.Column('series_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('bookings_series_id_fkey', 'bookings', 'booking_series', ['series_id'], ['id'], ondelete='CASCADE')
+    op.create_index(op.f('ix_bookings_series_id'), 'bookings', ['series_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_bookings_series_id'), table_name='bookings')
+    op.drop_constraint('bookings_series_id_fkey', 'bookings', type_='foreignkey')
+    op.drop_column('bookings', 'series_id')
+    op.drop_index(op.f('ix_booking_series_id'), table_name='booking_series')
+    op.drop_table('booking_series')
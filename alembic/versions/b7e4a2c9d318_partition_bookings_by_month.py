@@ -0,0 +1,188 @@
+"""Partition bookings by month on start_time, add the archive schema
+
+Revision ID: b7e4a2c9d318
+Revises: f3c7a1d95e28
+Create Date: 2026-10-18 17:02:41.265093
+
+Rewrites bookings into a RANGE (start_time) partitioned table, one partition
+per UTC month (see app/db/partitions.py). Copies every row under an exclusive
+lock, so plan a maintenance window on big tables.
+
+- The primary key becomes (id, start_time): a partitioned table's unique
+  constraints must contain the partition key. Ids still come from bookings_id_seq.
+- waitlist_entries.booking_id loses its foreign key, since bookings.id alone
+  is no longer unique as far as Postgres knows.
+- bookings_no_overlap is replaced by one exclusion constraint per partition,
+  plus a CHECK that no booking runs past its partition's upper bound. The
+  upgrade refuses to run while a booking crosses a month boundary.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e4a2c9d318'
+down_revision: Union[str, Sequence[str], None] = 'f3c7a1d95e28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Months created ahead of today, as BOOKINGS_PARTITIONS_AHEAD + 1 at the time of writing
+MONTHS_AHEAD = 25
+
+COLUMNS = "id, user_id, resource_id, series_id, start_time, end_time, status, expires_at, created_at"
+
+
+def create_indexes() -> None:
+    op.create_index('ix_bookings_id', 'bookings', ['id'], unique=False)
+    op.create_index('ix_bookings_series_id', 'bookings', ['series_id'], unique=False)
+    op.create_index('ix_bookings_start_time_id', 'bookings', ['start_time', 'id'], unique=False)
+    op.create_index('ix_bookings_user_id_start_time_id', 'bookings', ['user_id', 'start_time', 'id'], unique=False)
+    op.create_index('ix_bookings_held_expires_at', 'bookings', ['expires_at'], unique=False, postgresql_where=sa.text("status = 'held'"))
+    op.create_index(
+        'ix_bookings_occupied_resource_end', 'bookings', ['resource_id', 'end_time'], unique=False,
+        postgresql_include=['start_time', 'status', 'expires_at'],
+        postgresql_where=sa.text("status IN ('confirmed', 'held')"),
+    )
+    op.create_index(
+        'ix_bookings_occupied_end', 'bookings', ['end_time'], unique=False,
+        postgresql_include=['start_time', 'resource_id', 'status', 'expires_at'],
+        postgresql_where=sa.text("status IN ('confirmed', 'held')"),
+    )
+
+
+def create_foreign_keys() -> None:
+    op.create_foreign_key('bookings_user_id_fkey', 'bookings', 'user', ['user_id'], ['id'])
+    op.create_foreign_key('bookings_resource_id_fkey', 'bookings', 'resources', ['resource_id'], ['id'])
+    op.create_foreign_key('bookings_series_id_fkey', 'bookings', 'booking_series', ['series_id'], ['id'], ondelete='CASCADE')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Month arithmetic below must happen in UTC, whatever the server's zone
+    op.execute("SET LOCAL TIME ZONE 'UTC'")
+
+    # 1. A booking crossing a month boundary would fit no partition's bounds
+    op.execute(
+        """
+        DO $$
+        DECLARE crossing bigint;
+        BEGIN
+            SELECT count(*) INTO crossing FROM bookings
+            WHERE end_time > date_trunc('month', start_time) + interval '1 month';
+            IF crossing > 0 THEN
+                RAISE EXCEPTION '% booking(s) cross a month boundary (UTC); split or shorten them, then rerun', crossing;
+            END IF;
+        END $$
+        """
+    )
+
+    # 2. The new table and its partitions: every month with bookings, through MONTHS_AHEAD from now
+    op.drop_constraint('waitlist_entries_booking_id_fkey', 'waitlist_entries', type_='foreignkey')
+    op.execute(
+        """
+        CREATE TABLE bookings_partitioned (
+            id integer NOT NULL DEFAULT nextval('bookings_id_seq'::regclass),
+            user_id integer NOT NULL,
+            resource_id integer NOT NULL,
+            series_id integer,
+            start_time timestamp with time zone NOT NULL,
+            end_time timestamp with time zone NOT NULL,
+            status varchar,
+            expires_at timestamp with time zone,
+            created_at timestamp with time zone DEFAULT now()
+        ) PARTITION BY RANGE (start_time)
+        """
+    )
+    op.execute(
+        f"""
+        DO $$
+        DECLARE
+            lo timestamptz;
+            last timestamptz;
+            name text;
+        BEGIN
+            SELECT date_trunc('month', least(min(start_time), now())),
+                   date_trunc('month', greatest(max(start_time), now() + interval '{MONTHS_AHEAD} months'))
+              INTO lo, last
+              FROM bookings;
+            WHILE lo <= last LOOP
+                name := 'bookings_p' || to_char(lo, 'YYYY_MM');
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF bookings_partitioned ('
+                    'CONSTRAINT %I CHECK (end_time <= %L), '
+                    'CONSTRAINT %I EXCLUDE USING gist (resource_id WITH =, tstzrange(start_time, end_time) WITH &&) '
+                    'WHERE (status IN (''confirmed'', ''held''))'
+                    ') FOR VALUES FROM (%L) TO (%L)',
+                    name, name || '_within_bounds', lo + interval '1 month',
+                    name || '_no_overlap', lo, lo + interval '1 month'
+                );
+                lo := lo + interval '1 month';
+            END LOOP;
+        END $$
+        """
+    )
+
+    # 3. Move the rows over, keep the id sequence, swap the tables
+    op.execute(f"INSERT INTO bookings_partitioned ({COLUMNS}) SELECT {COLUMNS} FROM bookings")
+    op.execute("ALTER SEQUENCE bookings_id_seq OWNED BY bookings_partitioned.id")
+    op.drop_table('bookings')
+    op.rename_table('bookings_partitioned', 'bookings')
+
+    # 4. Keys and indexes, created on every partition through the parent
+    op.create_primary_key('bookings_pkey', 'bookings', ['id', 'start_time'])
+    create_foreign_keys()
+    create_indexes()
+
+    # 5. Where archived months go (app/db/partitions.py archive_partitions)
+    op.execute("CREATE SCHEMA IF NOT EXISTS archive")
+    op.execute("CREATE TABLE archive.bookings (LIKE public.bookings) PARTITION BY RANGE (start_time)")
+    op.create_index('ix_bookings_start_time_id', 'bookings', ['start_time', 'id'], unique=False, schema='archive')
+    op.create_index('ix_bookings_user_id_start_time_id', 'bookings', ['user_id', 'start_time', 'id'], unique=False, schema='archive')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # 1. One plain table again, archived months included
+    op.execute(
+        """
+        CREATE TABLE bookings_plain (
+            id integer NOT NULL DEFAULT nextval('bookings_id_seq'::regclass),
+            user_id integer NOT NULL,
+            resource_id integer NOT NULL,
+            series_id integer,
+            start_time timestamp with time zone NOT NULL,
+            end_time timestamp with time zone NOT NULL,
+            status varchar,
+            expires_at timestamp with time zone,
+            created_at timestamp with time zone DEFAULT now()
+        )
+        """
+    )
+    op.execute(f"INSERT INTO bookings_plain ({COLUMNS}) SELECT {COLUMNS} FROM bookings")
+    op.execute(f"INSERT INTO bookings_plain ({COLUMNS}) SELECT {COLUMNS} FROM archive.bookings")
+    op.execute("ALTER SEQUENCE bookings_id_seq OWNED BY bookings_plain.id")
+    op.execute("DROP TABLE archive.bookings")
+    op.execute("DROP SCHEMA IF EXISTS archive")
+    op.drop_table('bookings')
+    op.rename_table('bookings_plain', 'bookings')
+
+    # 2. Keys, the table-wide overlap constraint, indexes
+    op.create_primary_key('bookings_pkey', 'bookings', ['id'])
+    create_foreign_keys()
+    op.execute(
+        """
+        ALTER TABLE bookings
+        ADD CONSTRAINT bookings_no_overlap
+        EXCLUDE USING gist (resource_id WITH =, tstzrange(start_time, end_time) WITH &&)
+        WHERE (status IN ('confirmed', 'held'))
+        """
+    )
+    create_indexes()
+
+    # 3. Exported (dropped) months may have left dangling references
+    op.execute("UPDATE waitlist_entries SET booking_id = NULL WHERE booking_id NOT IN (SELECT id FROM bookings)")
+    op.create_foreign_key(
+        'waitlist_entries_booking_id_fkey', 'waitlist_entries', 'bookings', ['booking_id'], ['id'], ondelete='SET NULL'
+    )
@@ -0,0 +1,51 @@
+"""Add booking holds
+
+Revision ID: d81f3b6a9e47
+Revises: a4d9e2b7c1f5
+Create Date: 2026-10-18 13:41:09.772416
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd81f3b6a9e47'
+down_revision: Union[str, Sequence[str], None] = 'a4d9e2b7c1f5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('bookings', sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index('ix_bookings_held_expires_at', 'bookings', ['expires_at'], unique=False, postgresql_where=sa.text("status = 'held'"))
+    # Holds take part in the overlap check too
+    op.execute("ALTER TABLE bookings DROP CONSTRAINT IF EXISTS bookings_no_overlap")
+    op.execute(
+        """
+        ALTER TABLE bookings
+        ADD CONSTRAINT bookings_no_overlap
+        EXCLUDE USING gist (resource_id WITH =, tstzrange(start_time, end_time) WITH &&)
+        WHERE (status IN ('confirmed', 'held'))
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Outstanding holds would otherwise turn into bookings nobody confirmed
+    op.execute("UPDATE bookings SET status = 'expired' WHERE status = 'held'")
+    op.execute("ALTER TABLE bookings DROP CONSTRAINT IF EXISTS bookings_no_overlap")
+    op.execute(
+        """
+        ALTER TABLE bookings
+        ADD CONSTRAINT bookings_no_overlap
+        EXCLUDE USING gist (resource_id WITH =, tstzrange(start_time, end_time) WITH &&)
+        WHERE (status = 'confirmed')
+        """
+    )
+    op.drop_index('ix_bookings_held_expires_at', table_name='bookings', postgresql_where=sa.text("status = 'held'"))
+    op.drop_column('bookings', 'expires_at')
@@ -0,0 +1,44 @@
+"""Add covering partial indexes for overlap reads
+
+Revision ID: f3c7a1d95e28
+Revises: 6e2a8c4f0b13
+Create Date: 2026-10-18 15:37:12.840519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c7a1d95e28'
+down_revision: Union[str, Sequence[str], None] = '6e2a8c4f0b13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY: no write lock on bookings while building, but it cannot run
+    # inside a transaction. If it fails, drop the INVALID index and rerun.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_bookings_occupied_resource_end', 'bookings', ['resource_id', 'end_time'], unique=False,
+            postgresql_include=['start_time', 'status', 'expires_at'],
+            postgresql_where=sa.text("status IN ('confirmed', 'held')"),
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'ix_bookings_occupied_end', 'bookings', ['end_time'], unique=False,
+            postgresql_include=['start_time', 'resource_id', 'status', 'expires_at'],
+            postgresql_where=sa.text("status IN ('confirmed', 'held')"),
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_bookings_occupied_end', table_name='bookings', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_bookings_occupied_resource_end', table_name='bookings', postgresql_concurrently=True, if_exists=True)
@@ -1,3 +1,4 @@
+from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
@@ -6,36 +7,113 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.core import security
 from app.core.config import settings
-from app.db.session import get_db
+from app.core.principal_cache import Principal, principal_cache
+from app.db.session import AsyncSessionLocal, get_db, replica_router
 from app.models.user import User
 from app.schemas.tokens import TokenPayload
 
 # 1. DEFINE THE SOURCE
 # This tells FastAPI that the token comes from the "Authorization: Bearer <token>" header
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/login/access-token")
+# Same header, but missing is fine (read routing works for anonymous callers too)
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/login/access-token", auto_error=False)
 
-async def get_current_user(
-    db: AsyncSession = Depends(get_db),
-    token: str = Depends(oauth2_scheme)
-) -> User:
+def get_token_user_id(token: str = Depends(oauth2_scheme)) -> int:
     try:
         # 2. DECODE THE TOKEN
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
         )
         token_data = TokenPayload(**payload)
-    except (JWTError, ValidationError):
+        return int(token_data.sub)
+    except (JWTError, ValidationError, TypeError, ValueError):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
-        
-    # 3. FIND THE USER
-    query = select(User).where(User.id == int(token_data.sub))
+
+async def get_read_db(token: Optional[str] = Depends(optional_oauth2_scheme)):
+    """
+    Session for read-only handlers: the replica when it is configured, healthy
+    and the caller has not just written; the primary otherwise.
+    Auth itself is still enforced by get_current_user.
+    """
+    user_id = None
+    if token:
+        try:
+            user_id = get_token_user_id(token)
+        except HTTPException:
+            pass
+    session_factory = await replica_router.session_factory(user_id)
+    async with session_factory() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+async def get_current_user(
+    db: AsyncSession = Depends(get_db),
+    user_id: int = Depends(get_token_user_id)
+) -> Principal:
+    """
+    Who is calling? Answered from the principal cache when possible,
+    so most requests never touch the user table (or a pool connection) for auth.
+    """
+    principal = principal_cache.get(user_id)
+    if principal:
+        return principal
+
+    # 3. FIND THE USER (only the columns a Principal needs)
+    query = select(User.id, User.email, User.is_active, User.is_superuser).where(User.id == user_id)
+    result = await db.execute(query)
+    row = result.one_or_none()
+    
+    if not row:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    principal = Principal.from_user(row)
+    principal_cache.put(principal)
+    return principal
+
+async def authenticate(user_id: int) -> Principal:
+    """
+    get_current_user in a short session of its own, returned to the pool
+    before the caller goes on.
+    """
+    async with AsyncSessionLocal() as db:
+        return await get_current_user(db=db, user_id=user_id)
+
+async def get_streaming_user(user_id: int = Depends(get_token_user_id)) -> Principal:
+    """
+    get_current_user for long-lived responses (SSE, exports): a get_db session
+    would stay checked out until the response ends, one pool connection per
+    open stream.
+    """
+    return await authenticate(user_id)
+
+async def get_current_user_strict(
+    db: AsyncSession = Depends(get_db),
+    user_id: int = Depends(get_token_user_id)
+) -> User:
+    """
+    Strict mode for sensitive routes: always reads the live user row
+    (and refreshes the cached snapshot while at it).
+    """
+    query = select(User).where(User.id == user_id)
     result = await db.execute(query)
     user = result.scalar_one_or_none()
     
     if not user:
+        principal_cache.invalidate(user_id)
         raise HTTPException(status_code=404, detail="User not found")
-        
-    return user
\ No newline at end of file
+
+    principal_cache.put(Principal.from_user(user))
+    return user
+
+
+async def get_current_active_superuser(
+    current_user: User = Depends(get_current_user_strict),
+) -> User:
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    return current_user
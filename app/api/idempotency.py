@@ -0,0 +1,76 @@
+import hashlib
+from typing import Awaitable, Callable, Union
+from fastapi import HTTPException, Response
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.crud import crud_idempotency
+
+# Set on responses answered from the idempotency store
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+def fingerprint(route: str, body: str) -> bytes:
+    """
+    32-byte digest of what was asked for: reusing a key for anything else is an error.
+    """
+    return hashlib.sha256(f"{route}\n{body}".encode()).digest()
+
+
+async def run_idempotent(
+    db: AsyncSession,
+    user_id: int,
+    key: str,
+    request_fingerprint: bytes,
+    execute: Callable[[], Awaitable[Union[BaseModel, Response]]],
+) -> Response:
+    """
+    Run `execute` at most once per (user, Idempotency-Key).
+
+    - First request: claims the key, runs, stores the response for IDEMPOTENCY_TTL_SECONDS.
+    - Retries: get the stored response back without running anything (409 while
+      the first one is still in flight, 422 if the body differs).
+    - Failures (errors, non-2xx responses) are not stored: the key is released
+      and a retry runs again.
+    """
+    # 1. Claim the key in its own transaction, so concurrent duplicates see it
+    claimed = await crud_idempotency.claim(
+        db, user_id, key, request_fingerprint, settings.IDEMPOTENCY_LOCK_SECONDS
+    )
+    await db.commit()
+
+    # 2. Someone got here first: replay
+    if not claimed:
+        stored = await crud_idempotency.get(db, user_id, key)
+        await db.rollback()
+        if stored is not None and stored.fingerprint != request_fingerprint:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+        if stored is None or stored.status_code is None:
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+        return Response(
+            content=stored.response,
+            status_code=stored.status_code,
+            media_type="application/json",
+            headers={REPLAYED_HEADER: "true"},
+        )
+
+    # 3. Execute, then store the outcome (or give the key back)
+    try:
+        result = await execute()
+    except Exception:
+        await db.rollback()
+        await crud_idempotency.release(db, user_id, key)
+        await db.commit()
+        raise
+
+    if isinstance(result, Response):
+        status_code, body = result.status_code, bytes(result.body)
+    else:
+        status_code, body = 200, result.model_dump_json().encode()
+
+    if 200 <= status_code < 300:
+        await crud_idempotency.complete(db, user_id, key, status_code, body, settings.IDEMPOTENCY_TTL_SECONDS)
+    else:
+        await crud_idempotency.release(db, user_id, key)
+    await db.commit()
+    return Response(content=body, status_code=status_code, media_type="application/json")
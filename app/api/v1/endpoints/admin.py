@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Depends
+from app.api import deps
+from app.db.session import get_pool_status, replica_router
+from app.models.user import User
+
+router = APIRouter()
+
+# --- 1. CONNECTION POOL ---
+@router.get("/db-pool")
+async def read_db_pool(
+    current_user: User = Depends(deps.get_current_active_superuser)
+):
+    """
+    Live connection pool usage: checked out, idle, overflow and checkout wait times.
+    Use it to size DB_POOL_SIZE / DB_MAX_OVERFLOW against Postgres max_connections.
+    """
+    return get_pool_status()
+
+# --- 2. READ REPLICA ---
+@router.get("/db-replica")
+async def read_db_replica(
+    current_user: User = Depends(deps.get_current_active_superuser)
+):
+    """
+    Replica health, replay lag and how many reads went to replica vs primary.
+    """
+    return replica_router.stats()
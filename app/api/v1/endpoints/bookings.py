@@ -1,87 +1,499 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+from datetime import datetime
+from typing import List, Literal, Optional, Union
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, WebSocket, WebSocketDisconnect, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.session import get_db
-from app.schemas.booking import BookingCreate, BookingResponse
+from app.db import partitions
+from app.db.session import get_db, replica_router
+from app.schemas.booking import (
+    BookingCreate, BookingResponse, BookingBatchItem, BookingBatchResponse,
+    BookingOccurrence, BookingSeriesResponse, AutoBookingCreate, BookingHoldCreate,
+)
+from app.core.config import settings
+from app.core import recurrence, export
+from app.core.fast_json import RowSerializer, json_response
+from app.core.pagination import decode_cursor, set_next_cursor
 from app.crud import crud_booking
 from app.api import deps
-from app.models.user import User
+from app.api.idempotency import fingerprint, run_idempotent
+from app.core.principal_cache import Principal
+from app.core.change_feed import change_feed
 from sqlalchemy import select
 from app.models.booking import Booking
 
 router = APIRouter()
 
-@router.post("/", response_model=BookingResponse)
+# GET /bookings/ from plain rows (FAST_JSON_RESPONSES, ?fields=)
+booking_rows = RowSerializer(BookingResponse)
+
+def check_slot(start_time: datetime, end_time: datetime):
+    """
+    400 for slots the partitioned bookings table cannot hold.
+    """
+    problem = partitions.slot_problem(start_time, end_time)
+    if problem:
+        raise HTTPException(status_code=400, detail=problem)
+
+@router.post("/", response_model=Union[BookingResponse, BookingSeriesResponse])
 async def create_booking(
     booking_in: BookingCreate,
+    idempotency_key: Optional[str] = Header(None, min_length=1, max_length=255),
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(deps.get_current_user)
+    current_user: Principal = Depends(deps.get_current_user)
 ):
     """
     Create a new booking. Fails if the slot is taken.
+    With `recurrence`, books the whole series and lists conflicting occurrences.
+
+    Send an `Idempotency-Key` header to make retries safe: a repeat of a
+    successful request gets the original response back (marked with
+    `Idempotent-Replayed: true`) instead of booking again.
     """
-    # 1. Validate Logic (Start < End)
+    # 1. Validate Logic (Start < End, fits a partition)
     if booking_in.start_time >= booking_in.end_time:
         raise HTTPException(status_code=400, detail="Start time must be before end time")
+    check_slot(booking_in.start_time, booking_in.end_time)
+
+    if idempotency_key is None:
+        return await book(db, booking_in, current_user)
+    return await run_idempotent(
+        db, current_user.id, idempotency_key,
+        fingerprint("POST /bookings/", booking_in.model_dump_json()),
+        lambda: book(db, booking_in, current_user),
+    )
+
+async def book(db: AsyncSession, booking_in: BookingCreate, current_user: Principal):
+    if booking_in.recurrence:
+        return await create_booking_series(db, booking_in, current_user)
 
     # 2. Attempt to Book
     booking = await crud_booking.create_booking(db=db, obj_in=booking_in, user_id=current_user.id)
     
     if not booking:
         raise HTTPException(status_code=409, detail="Resource is already booked for this time slot")
-        
+
+    replica_router.note_write(current_user.id)
+    return BookingResponse.model_validate(booking)
+
+@router.post("/hold", response_model=BookingResponse)
+async def create_booking_hold(
+    hold_in: BookingHoldCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(deps.get_current_user)
+):
+    """
+    Hold a slot for a few minutes (status "held", see `expires_at`) while the
+    user confirms. Nobody else can book it meanwhile; unconfirmed holds lapse
+    on their own.
+    """
+    # 1. Validate Logic (Start < End, fits a partition)
+    if hold_in.start_time >= hold_in.end_time:
+        raise HTTPException(status_code=400, detail="Start time must be before end time")
+    check_slot(hold_in.start_time, hold_in.end_time)
+    hold_seconds = min(hold_in.hold_seconds or settings.BOOKING_HOLD_SECONDS, settings.BOOKING_HOLD_MAX_SECONDS)
+
+    # 2. Attempt to Hold
+    booking = await crud_booking.create_booking(
+        db=db, obj_in=hold_in, user_id=current_user.id, hold_seconds=hold_seconds
+    )
+    if not booking:
+        raise HTTPException(status_code=409, detail="Resource is already booked for this time slot")
+    replica_router.note_write(current_user.id)
     return booking
 
+@router.post("/{booking_id}/confirm", response_model=BookingResponse)
+async def confirm_booking_hold(
+    booking_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(deps.get_current_user)
+):
+    """
+    Turn your hold into a confirmed booking. 410 if the hold has lapsed.
+    """
+    booking = await crud_booking.confirm_hold(db=db, booking_id=booking_id, user_id=current_user.id)
+    if booking:
+        replica_router.note_write(current_user.id)
+        return booking
+
+    # Why not? Only worth a second query on the failure path
+    booking = await db.get(Booking, booking_id)
+    if not booking or booking.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    if booking.status == "confirmed":
+        return booking
+    if booking.status in ("held", "expired"):
+        raise HTTPException(status_code=410, detail="Hold has expired")
+    raise HTTPException(status_code=409, detail=f"Booking is {booking.status}, not held")
+
+@router.post("/auto", response_model=BookingResponse)
+async def create_booking_auto(
+    booking_in: AutoBookingCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(deps.get_current_user)
+):
+    """
+    Book ANY free resource matching the filters, e.g. "a 6-person room on Floor 2 at 10:00".
+    Picks the smallest room that fits; concurrent callers get different rooms.
+    """
+    if booking_in.start_time >= booking_in.end_time:
+        raise HTTPException(status_code=400, detail="Start time must be before end time")
+    check_slot(booking_in.start_time, booking_in.end_time)
+
+    booking = await crud_booking.auto_book(
+        db=db, obj_in=booking_in, user_id=current_user.id,
+        max_attempts=settings.AUTO_BOOK_MAX_ATTEMPTS
+    )
+    if not booking:
+        raise HTTPException(status_code=409, detail="No matching resource is free for this time slot")
+    replica_router.note_write(current_user.id)
+    return booking
+
+async def create_booking_series(db: AsyncSession, booking_in: BookingCreate, current_user: Principal):
+    # 1. Expand the rule into concrete slots
+    try:
+        slots = recurrence.expand(
+            booking_in.start_time, booking_in.end_time, booking_in.recurrence,
+            max_occurrences=settings.RECURRENCE_MAX_OCCURRENCES
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if not slots:
+        raise HTTPException(status_code=400, detail="Recurrence produces no occurrences")
+    # Occurrences the table cannot hold (too far ahead, too long): with
+    # skip_conflicts they are skipped like taken slots, otherwise a 400
+    unbookable = []
+    for i, (start, end) in enumerate(slots):
+        if partitions.slot_problem(start, end):
+            if not booking_in.recurrence.skip_conflicts:
+                check_slot(start, end)
+            unbookable.append(i)
+
+    # 2. One conflict pass over the resource's bookings, then one INSERT
+    result = await crud_booking.create_recurring(
+        db=db, obj_in=booking_in, user_id=current_user.id, slots=slots, unbookable=unbookable
+    )
+    if result is None:
+        raise HTTPException(status_code=409, detail="A concurrent booking took one of these slots, please retry")
+    series, created, conflicts = result
+
+    report = BookingSeriesResponse(
+        series_id=series.id if series else None,
+        rrule=booking_in.recurrence.to_rrule(),
+        occurrences=len(slots),
+        created=[BookingResponse.model_validate(b) for b in created],
+        conflicts=[BookingOccurrence(start_time=slots[i][0], end_time=slots[i][1]) for i in conflicts],
+    )
+    if series is None:
+        return JSONResponse(status_code=409, content=jsonable_encoder(report))
+    replica_router.note_write(current_user.id)
+    return report
+
+@router.post("/batch", response_model=BookingBatchResponse)
+async def create_bookings_batch(
+    bookings_in: List[BookingCreate],
+    mode: Literal["atomic", "best_effort"] = "atomic",
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(deps.get_current_user)
+):
+    """
+    Create many bookings in one request.
+    - atomic: all or nothing. Any conflict -> 409 and nothing is booked.
+    - best_effort: book whatever fits, report the rest as conflicts.
+    """
+    if not bookings_in:
+        raise HTTPException(status_code=400, detail="No bookings given")
+    if len(bookings_in) > settings.BOOKING_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {settings.BOOKING_BATCH_MAX_SIZE} bookings per batch")
+
+    # 1. Validate Logic (Start < End, fits a partition) per item
+    invalid = {}
+    for i, b in enumerate(bookings_in):
+        if b.recurrence:
+            invalid[i] = "Recurring bookings are not supported in a batch"
+        elif b.start_time >= b.end_time:
+            invalid[i] = "Start time must be before end time"
+        elif problem := partitions.slot_problem(b.start_time, b.end_time):
+            invalid[i] = problem
+    candidates = [(i, b) for i, b in enumerate(bookings_in) if i not in invalid]
+
+    # 2. Attempt to Book (one conflict query + one INSERT)
+    atomic = mode == "atomic"
+    if atomic and invalid:
+        created, conflicts = {}, set()
+    else:
+        result = await crud_booking.create_bookings_batch(
+            db=db, candidates=candidates, user_id=current_user.id, atomic=atomic
+        )
+        if result is None:
+            raise HTTPException(status_code=409, detail="A concurrent booking took one of these slots, please retry")
+        created, conflicts = result
+
+    # 3. Per-item report, in request order
+    items = []
+    for i in range(len(bookings_in)):
+        if i in created:
+            items.append(BookingBatchItem(index=i, status="created", booking=BookingResponse.model_validate(created[i])))
+        elif i in invalid:
+            items.append(BookingBatchItem(index=i, status="invalid", detail=invalid[i]))
+        elif i in conflicts:
+            items.append(BookingBatchItem(index=i, status="conflict", detail="Resource is already booked for this time slot"))
+        else:
+            items.append(BookingBatchItem(index=i, status="conflict", detail="Not booked: another item in this batch failed"))
+
+    report = BookingBatchResponse(mode=mode, created=len(created), failed=len(bookings_in) - len(created), items=items)
+    if created:
+        replica_router.note_write(current_user.id)
+    if atomic and report.failed:
+        return JSONResponse(status_code=409, content=jsonable_encoder(report))
+    return report
+
 @router.get("/", response_model=List[BookingResponse])
 async def read_bookings(
-    skip: int = 0,
-    limit: int = 100,
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(deps.get_current_user)
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    skip: int = Query(0, ge=0, deprecated=True),
+    fields: Optional[str] = Query(None, description="Comma-separated subset of the fields to return"),
+    db: AsyncSession = Depends(deps.get_read_db),
+    current_user: Principal = Depends(deps.get_current_user)
 ):
     """
-    Retrieve bookings.
+    Retrieve bookings, ordered by start time.
     - Superusers: See ALL bookings.
     - Regular Users: See only THEIR OWN bookings.
+
+    Paginate with the X-Next-Cursor response header: pass it back as ?cursor=.
+    `skip` (OFFSET) still works but gets slower with every page.
+    `fields` (e.g. ?fields=resource_id,start_time,end_time,status) selects and returns only those columns.
     """
+    after = decode_cursor(cursor, datetime, int)
+    serializer = booking_rows.pick(fields)
+    # Plain rows of just the wanted columns (+ the cursor key), serialized once
+    # (?fields= or FAST_JSON_RESPONSES), or ORM objects for response_model
+    columns = serializer.columns(Booking, "start_time", "id") if fields or settings.FAST_JSON_RESPONSES else None
     if current_user.is_superuser:
         # Admin sees everything
-        return await crud_booking.get_multi(db, skip=skip, limit=limit)
+        bookings = await crud_booking.get_multi(db, skip=skip, limit=limit, after=after, columns=columns)
     else:
         # User sees only their own stuff
-        return await crud_booking.get_by_user(
+        bookings = await crud_booking.get_by_user(
             db=db, 
             user_id=current_user.id, 
             skip=skip, 
-            limit=limit
+            limit=limit,
+            after=after,
+            columns=columns
         )
+    set_next_cursor(response, bookings, limit, "start_time", "id")
+    if columns:
+        return json_response(serializer.dump_json(bookings), response)
+    return bookings
     
+#streaming export (CSV / NDJSON)
+
+@router.get("/export")
+async def export_bookings(
+    format: Literal["csv", "ndjson"] = "csv",
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    current_user: Principal = Depends(deps.get_streaming_user)
+):
+    """
+    Download bookings starting in [from, to) as CSV or NDJSON.
+    - Superusers: ALL bookings. Regular Users: only THEIR OWN.
+    Rows are streamed from a server-side cursor, so memory use is the same
+    for 100 rows or 10 million.
+    """
+    if from_ and to and from_ >= to:
+        raise HTTPException(status_code=400, detail="'from' must be before 'to'")
+    user_id = None if current_user.is_superuser else current_user.id
+    # Reads the replica when it is safe to
+    session_factory = await replica_router.session_factory(current_user.id)
+
+    async def body():
+        # Own session, opened when streaming starts and closed when it ends
+        # (auth above did not take one for the whole response either)
+        async with session_factory() as db:
+            if format == "csv":
+                yield export.csv_header()
+            async for rows in crud_booking.stream_export(
+                db, user_id=user_id, start_time=from_, end_time=to,
+                chunk_size=settings.EXPORT_CHUNK_SIZE
+            ):
+                yield export.csv_chunk(rows) if format == "csv" else export.ndjson_chunk(rows)
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"bookings.{format}"
+    return StreamingResponse(
+        body(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+#history moved out of the live table
+
+@router.get("/archive", response_model=List[BookingResponse])
+async def read_archived_bookings(
+    response: Response,
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(deps.get_read_db),
+    current_user: Principal = Depends(deps.get_current_user)
+):
+    """
+    Bookings from archived months (see app/db/partitions.py), which GET /bookings/
+    no longer lists, ordered by start time. Same visibility rules and
+    X-Next-Cursor pagination. Narrow it with ?from= / ?to= (start time).
+    """
+    if from_ and to and from_ >= to:
+        raise HTTPException(status_code=400, detail="'from' must be before 'to'")
+    rows = await crud_booking.get_archived(
+        db,
+        user_id=None if current_user.is_superuser else current_user.id,
+        start_time=from_,
+        end_time=to,
+        limit=limit,
+        after=decode_cursor(cursor, datetime, int),
+    )
+    set_next_cursor(response, rows, limit, "start_time", "id")
+    return rows
+
+#live change feed (SSE / WebSocket)
+
+async def subscribe_or_503(resource_ids: Optional[List[int]]):
+    if not settings.CHANGE_FEED_ENABLED:
+        raise HTTPException(status_code=404, detail="Change feed is disabled")
+    subscription = await change_feed.subscribe(resource_ids)
+    if subscription is None:
+        raise HTTPException(status_code=503, detail="Too many change feed subscribers, retry later")
+    return subscription
+
+@router.get("/stream")
+async def stream_booking_changes(
+    resource_id: Optional[List[int]] = Query(None),
+    current_user: Principal = Depends(deps.get_streaming_user)
+):
+    """
+    Server-Sent Events: one `booking` event per created or cancelled booking,
+    optionally only for the given resources (?resource_id=1&resource_id=2).
+    A client that falls too far behind gets a `dropped` event and should reconnect.
+    """
+    subscription = await subscribe_or_503(resource_id)
+
+    async def events():
+        try:
+            yield b"retry: 3000\n\n"
+            while True:
+                payload = await subscription.get(settings.CHANGE_FEED_KEEPALIVE_SECONDS)
+                if payload is None:
+                    yield b"event: dropped\ndata: {}\n\n"
+                    return
+                if payload == "":
+                    # Comment line: keeps proxies from closing an idle stream
+                    yield b": keep-alive\n\n"
+                else:
+                    yield f"event: booking\ndata: {payload}\n\n".encode()
+        finally:
+            change_feed.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.websocket("/stream")
+async def stream_booking_changes_ws(websocket: WebSocket, resource_id: Optional[List[int]] = Query(None)):
+    """
+    Same feed over a WebSocket, one JSON text message per change.
+    Browsers cannot set headers here, so the token may also come as ?token=.
+    """
+    # 1. Authenticate (header or query string)
+    token = websocket.query_params.get("token")
+    authorization = websocket.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    if not token:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Not authenticated")
+        return
+    try:
+        user_id = deps.get_token_user_id(token)
+        await deps.authenticate(user_id)
+        subscription = await subscribe_or_503(resource_id)
+    except HTTPException as exc:
+        code = status.WS_1013_TRY_AGAIN_LATER if exc.status_code == 503 else status.WS_1008_POLICY_VIOLATION
+        await websocket.close(code=code, reason=str(exc.detail))
+        return
+
+    # 2. Notice a client that leaves while the feed is quiet
+    await websocket.accept()
+
+    async def watch_disconnect():
+        try:
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+        finally:
+            subscription.close()
+
+    watcher = asyncio.create_task(watch_disconnect())
+
+    # 3. Relay
+    try:
+        while True:
+            payload = await subscription.get(None)
+            if payload is None:
+                if not watcher.done():
+                    await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason="Consumer too slow")
+                return
+            await websocket.send_text(payload)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        watcher.cancel()
+        change_feed.unsubscribe(subscription)
+
+#endpoint to cancel a whole recurring series
+
+@router.delete("/series/{series_id}")
+async def delete_booking_series(
+    series_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(deps.get_current_user)
+):
+    """
+    Cancel every occurrence of a recurring booking you own.
+    """
+    cancelled = await crud_booking.cancel_series(db=db, series_id=series_id, user_id=current_user.id)
+    if not cancelled:
+        raise HTTPException(status_code=404, detail="Booking series not found")
+    replica_router.note_write(current_user.id)
+    return {"series_id": series_id, "cancelled": cancelled}
+
 #endpoint to delete a booking
 
 @router.delete("/{booking_id}", response_model=BookingResponse)
 async def delete_booking(
     booking_id: int,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(deps.get_current_user)
+    current_user: Principal = Depends(deps.get_current_user)
 ):
     """
     Cancel a booking.
     """
-    # 1. Find the booking
-    result = await db.execute(select(Booking).where(Booking.id == booking_id))
-    booking = result.scalar_one_or_none()
-    
-    if not booking:
+    # 1. Delete, with the ownership check in the WHERE clause (one round trip)
+    booking = await crud_booking.delete_booking(db=db, booking_id=booking_id, user_id=current_user.id)
+    if booking:
+        replica_router.note_write(current_user.id)
+        return BookingResponse.model_validate(booking)
+
+    # 2. Nothing deleted: missing, or someone else's? Only the failure path pays for this
+    exists = await db.scalar(select(Booking.id).where(Booking.id == booking_id))
+    if exists is None:
         raise HTTPException(status_code=404, detail="Booking not found")
-        
-    # 2. SECURITY CHECK: Am I the owner? (Or a Superuser?)
-    if booking.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not enough permissions")
-        
-    # 3. Delete
-    await db.delete(booking)
-    await db.commit()
-    
-    return booking
+    raise HTTPException(status_code=403, detail="Not enough permissions")
 
 
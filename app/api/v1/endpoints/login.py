@@ -6,7 +6,8 @@ from sqlalchemy.future import select
 from app.db.session import get_db
 from app.models.user import User
 from app.schemas.tokens import Token
-from app.core.security import verify_password, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.core.security import verify_and_update_async, create_access_token, password_hasher, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.api import deps
 
 router = APIRouter()
 
@@ -20,13 +21,22 @@ async def login_access_token(
     result = await db.execute(query)
     user = result.scalar_one_or_none()
 
-    # 2. VERIFY PASSWORD
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    # 2. VERIFY PASSWORD (on the hashing pool, not the event loop)
+    if user:
+        valid, new_hash = await verify_and_update_async(form_data.password, user.hashed_password)
+    else:
+        valid, new_hash = False, None
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+    # 2b. REHASH if BCRYPT_ROUNDS changed since this hash was made
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
     
     # 3. CHECK IF ACTIVE
     if not user.is_active:
@@ -41,4 +51,10 @@ async def login_access_token(
     return {
         "access_token": access_token, 
         "token_type": "bearer"
-    }
\ No newline at end of file
+    }
+
+#hashing pool queue depth and wait times (admins only)
+
+@router.get("/login/hash-pool/stats")
+async def read_hash_pool_stats(current_user: User = Depends(deps.get_current_active_superuser)):
+    return password_hasher.stats()
@@ -1,60 +1,176 @@
-from typing import List
+from typing import List, Literal, Optional
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.session import get_db
-from app.schemas.resource import ResourceCreate, ResourceResponse
+from app.db.session import get_db, replica_router
+from app.schemas.resource import ResourceCreate, ResourceResponse, AvailabilityGridResponse
 from app.crud import crud_resource
+from app.core.availability import availability_index, ensure_aware
+from app.core import availability_grid
+from app.core.config import settings
+from app.core.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from app.core.catalog_cache import catalog_cache, etag_matches
+from app.core.fast_json import RowSerializer, json_response
 from app.api import deps
+from app.models.resource import Resource
 from app.models.user import User
+from app.core.principal_cache import Principal
 
 router = APIRouter()
 
+# Built once; serializes a whole catalog page straight to JSON bytes
+resource_list_adapter = TypeAdapter(List[ResourceResponse])
+# Same, from plain rows (FAST_JSON_RESPONSES, ?fields=)
+resource_rows = RowSerializer(ResourceResponse)
+
 # --- 1. SEARCH ENDPOINT (New) ---
 @router.get("/search", response_model=List[ResourceResponse])
 async def search_resources(
     start_time: datetime,
     end_time: datetime,
     min_capacity: int = 1,
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(deps.get_current_user)
+    fields: Optional[str] = Query(None, description="Comma-separated subset of the fields to return"),
+    db: AsyncSession = Depends(deps.get_read_db),
+    current_user: Principal = Depends(deps.get_current_user)
 ):
     """
     Find available resources for a specific time slot.
     Example: ?start_time=2026-02-15T10:00:00Z&end_time=2026-02-15T11:00:00Z
+    Add e.g. &fields=id,name to get only those fields.
     """
     if start_time >= end_time:
          raise HTTPException(status_code=400, detail="Start time must be before end time")
          
+    serializer = resource_rows.pick(fields)
+    fast = bool(fields) or settings.FAST_JSON_RESPONSES
     resources = await crud_resource.get_available(
         db=db, 
         start_time=start_time, 
         end_time=end_time, 
-        min_capacity=min_capacity
+        min_capacity=min_capacity,
+        columns=serializer.columns(Resource) if fast else None
     )
-    return resources
+    if not fast:
+        return resources
+    if availability_index.loaded:
+        # Already ResourceResponse models, only the encoding is left
+        include = {"__all__": set(serializer.fields)} if fields else None
+        return json_response(resource_list_adapter.dump_json(resources, include=include))
+    return json_response(serializer.dump_json(resources))
+
+# --- 1a. FREE/BUSY GRID ---
+@router.get("/availability-grid", response_model=AvailabilityGridResponse)
+async def read_availability_grid(
+    start: datetime,
+    end: datetime,
+    slot: str = "15m",
+    type: Optional[str] = None,
+    min_capacity: int = 1,
+    encoding: Literal["bitset", "rle"] = "bitset",
+    db: AsyncSession = Depends(deps.get_read_db),
+    current_user: Principal = Depends(deps.get_current_user)
+):
+    """
+    Free/busy line for every matching resource over [start, end), one bit per slot.
+    Example: ?start=2026-02-15T08:00:00Z&end=2026-02-22T08:00:00Z&slot=15m
+    """
+    if start >= end:
+        raise HTTPException(status_code=400, detail="Start time must be before end time")
+    try:
+        step = availability_grid.parse_slot(slot)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    slots = -(-(end - start) // step)  # ceil
+    if slots > settings.AVAILABILITY_GRID_MAX_SLOTS:
+        raise HTTPException(status_code=400, detail=f"Window too large: at most {settings.AVAILABILITY_GRID_MAX_SLOTS} slots")
+
+    slot_seconds = int(step.total_seconds())
+    rows = await crud_resource.get_busy_slot_rows(
+        db=db, start_time=start, end_time=end, slot_seconds=slot_seconds, slots=slots,
+        min_capacity=min_capacity, type=type
+    )
+    return AvailabilityGridResponse(
+        start=ensure_aware(start),
+        end=ensure_aware(end),
+        slot_seconds=slot_seconds,
+        slots=slots,
+        encoding=encoding,
+        resources=availability_grid.build_grid(rows, slots, encoding),
+    )
+
+# --- 1b. AVAILABILITY INDEX CHECK (Admin) ---
+@router.get("/availability-index/check")
+async def check_availability_index(
+    repair: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(deps.get_current_active_superuser)
+):
+    """
+    Compare the in-memory availability index with the database.
+    Pass ?repair=true to reload it when it has drifted.
+    """
+    if not availability_index.loaded:
+        raise HTTPException(status_code=404, detail="Availability index is disabled")
+    return await availability_index.check(db, repair=repair)
 
 # --- 2. LIST ALL ENDPOINT ---
 @router.get("/", response_model=List[ResourceResponse])
 async def read_resources(
-    skip: int = 0,
-    limit: int = 100,
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(deps.get_current_user)
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    skip: int = Query(0, ge=0, deprecated=True),
+    fields: Optional[str] = Query(None, description="Comma-separated subset of the fields to return"),
+    db: AsyncSession = Depends(deps.get_read_db),
+    current_user: Principal = Depends(deps.get_current_user)
 ):
     """
-    Retrieve all resources.
+    Retrieve all resources, ordered by id.
+    Next page: pass the X-Next-Cursor response header back as ?cursor=.
+    `fields` (e.g. ?fields=id,name) selects and returns only those columns.
+
+    The catalog is served pre-serialized from memory with a strong ETag;
+    send it back as If-None-Match to get a 304 while nothing has changed.
     """
-    return await crud_resource.get_multi(db, skip=skip, limit=limit)
+    serializer = resource_rows.pick(fields)
+    key = (cursor, limit, skip, serializer.fields if fields else None)
+    page = catalog_cache.get(key)
+    if page is None:
+        version = catalog_cache.version
+        after = decode_cursor(cursor, int)
+        if fields or settings.FAST_JSON_RESPONSES:
+            resources = await crud_resource.get_multi(
+                db, skip=skip, limit=limit, after_id=after[0] if after else None, columns=serializer.columns(Resource, "id")
+            )
+            body = serializer.dump_json(resources)
+        else:
+            resources = await crud_resource.get_multi(db, skip=skip, limit=limit, after_id=after[0] if after else None)
+            body = resource_list_adapter.dump_json(resource_list_adapter.validate_python(resources, from_attributes=True))
+        next_cursor = encode_cursor(resources[-1].id) if len(resources) == limit else None
+        page = catalog_cache.put(key, version, body, next_cursor)
+
+    headers = {
+        "ETag": page.etag,
+        "Cache-Control": f"private, max-age={settings.CATALOG_CLIENT_MAX_AGE}, must-revalidate",
+    }
+    if page.next_cursor:
+        headers[NEXT_CURSOR_HEADER] = page.next_cursor
+    if etag_matches(request.headers.get("if-none-match"), page.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=page.body, media_type="application/json", headers=headers)
 
 # --- 3. CREATE ENDPOINT ---
 @router.post("/", response_model=ResourceResponse)
 async def create_resource(
     resource_in: ResourceCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(deps.get_current_user)
+    current_user: Principal = Depends(deps.get_current_user)
 ):
     """
     Create a new resource.
     """
-    return await crud_resource.create_resource(db=db, obj_in=resource_in)
\ No newline at end of file
+    resource = await crud_resource.create_resource(db=db, obj_in=resource_in)
+    replica_router.note_write(current_user.id)
+    return resource
\ No newline at end of file
@@ -1,16 +1,24 @@
-from fastapi import Depends, HTTPException, APIRouter
+from fastapi import Depends, HTTPException, APIRouter, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.session import get_db
 from app.models.user import User
 from sqlalchemy.future import select
+from sqlalchemy.dialects.postgresql import insert
 from app.schemas.user import UserCreate, UserResponce
-from typing import List
-from app.core.security import get_password_hash
+from typing import List, Optional
+from app.core.security import get_password_hash_async
 from app.api import deps
+from app.core.config import settings
+from app.core.fast_json import RowSerializer, json_response
+from app.core.pagination import decode_cursor, set_next_cursor
+from app.core.principal_cache import principal_cache
 from app.models.user import User
 
 router = APIRouter()
 
+# GET /users/ from plain rows (FAST_JSON_RESPONSES, ?fields=)
+user_rows = RowSerializer(UserResponce)
+
 # end points
 
 #post
@@ -19,46 +27,69 @@ router = APIRouter()
 #function -> user creation 
 async def create_user(user_in: UserCreate, db: AsyncSession = Depends(get_db)):
 
-    # check if user mail already exists?
-
-    query = select(User).where(User.email == user_in.email)
-    result = await db.execute(query)
-    existing_user = result.scalar_one_or_none()
-
-    if existing_user:
+    # cheap existence check first: a taken email must not cost a bcrypt hash
+    # (repeated sign-ups for one address would otherwise burn CPU for free)
+    taken = await db.execute(select(User.id).where(User.email == user_in.email))
+    if taken.first() is not None:
         raise HTTPException(status_code=400, detail="Email already exists")
 
-    # creating new user if doesn't exists already
-
-    new_user = User(
+    # creating the user: the unique email index still decides a race between
+    # the check and the INSERT
+    query = insert(User).values(
         email=user_in.email,
         full_name=user_in.full_name,
         # THE FIX: Real encryption happens here
-        hashed_password=get_password_hash(user_in.password),
-        is_active=True, 
-    )
+        hashed_password=await get_password_hash_async(user_in.password),
+        is_active=True,
+    ).on_conflict_do_nothing(index_elements=[User.email]).returning(User)
+    new_user = (await db.execute(query)).scalar_one_or_none()
 
+    if new_user is None:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Email already exists")
 
-    # adding new user to the Database
-
-    db.add(new_user)
     await db.commit()
-    await db.refresh(new_user)
 
-    return new_user
+    return UserResponce.model_validate(new_user)
 
 #get response model
 
 @router.get("/", response_model=List[UserResponce])
-async def read_users(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)):
-    query = select(User).offset(skip).limit(limit)
-    result = await db.execute(query)
-    return result.scalars().all()
+async def read_users(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    skip: int = Query(0, ge=0, deprecated=True),
+    fields: Optional[str] = Query(None, description="Comma-separated subset of the fields to return"),
+    db: AsyncSession = Depends(deps.get_read_db)
+):
+    # keyset pagination on id, next page cursor goes out in X-Next-Cursor
+    after = decode_cursor(cursor, int)
+    serializer = user_rows.pick(fields)
+    fast = bool(fields) or settings.FAST_JSON_RESPONSES
+    # plain rows of the wanted columns (+ id for the cursor) serialized once, or ORM objects for response_model
+    query = (select(*serializer.columns(User, "id")) if fast else select(User)).order_by(User.id)
+    if after:
+        query = query.where(User.id > after[0])
+    else:
+        query = query.offset(skip)
+    result = await db.execute(query.limit(limit))
+    users = result.all() if fast else result.scalars().all()
+    set_next_cursor(response, users, limit, "id")
+    if fast:
+        return json_response(serializer.dump_json(users), response)
+    return users
 
 
 #endpoint that only works if you are logged in
 
 @router.get("/me", response_model=UserResponce)
-async def read_user_me(current_user : User = Depends(deps.get_current_user)):
-    #get current user
-    return current_user
\ No newline at end of file
+async def read_user_me(current_user : User = Depends(deps.get_current_user_strict)):
+    #get current user (strict: the full, live row)
+    return current_user
+
+#auth cache hit/miss counters (admins only)
+
+@router.get("/principal-cache/stats")
+async def read_principal_cache_stats(current_user : User = Depends(deps.get_current_active_superuser)):
+    return principal_cache.stats()
\ No newline at end of file
@@ -0,0 +1,55 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import partitions
+from app.db.session import get_db
+from app.schemas.waitlist import WaitlistCreate, WaitlistResponse
+from app.crud import crud_waitlist
+from app.api import deps
+from app.core.principal_cache import Principal
+
+router = APIRouter()
+
+# --- 1. JOIN ---
+@router.post("/", response_model=WaitlistResponse)
+async def join_waitlist(
+    entry_in: WaitlistCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(deps.get_current_user)
+):
+    """
+    Wait for a taken slot. When it frees up you are booked automatically
+    (status "promoted", see `booking_id`), best priority first, then first come.
+    """
+    if entry_in.start_time >= entry_in.end_time:
+        raise HTTPException(status_code=400, detail="Start time must be before end time")
+    problem = partitions.slot_problem(entry_in.start_time, entry_in.end_time)
+    if problem:
+        raise HTTPException(status_code=400, detail=problem)
+    priority = entry_in.priority if current_user.is_superuser else 0
+    return await crud_waitlist.create_entry(db=db, obj_in=entry_in, user_id=current_user.id, priority=priority)
+
+# --- 2. MY ENTRIES ---
+@router.get("/", response_model=List[WaitlistResponse])
+async def read_waitlist(
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(deps.get_current_user)
+):
+    """
+    Your waitlist entries, newest first. Read from the primary, so a
+    promotion shows up as soon as it happened.
+    """
+    return await crud_waitlist.get_by_user(db=db, user_id=current_user.id, limit=limit)
+
+# --- 3. LEAVE ---
+@router.delete("/{entry_id}", response_model=WaitlistResponse)
+async def leave_waitlist(
+    entry_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(deps.get_current_user)
+):
+    entry = await crud_waitlist.cancel_entry(db=db, entry_id=entry_id, user_id=current_user.id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Waiting entry not found")
+    return entry
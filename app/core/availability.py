@@ -0,0 +1,162 @@
+from bisect import bisect_left
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.models.booking import Booking, occupies_slot
+from app.models.resource import Resource
+from app.schemas.resource import ResourceResponse
+
+# (start_time, end_time, booking_id)
+Interval = Tuple[datetime, datetime, int]
+
+
+def ensure_aware(dt: datetime) -> datetime:
+    # Naive query params are treated as UTC, same as Postgres does for timestamptz
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+class AvailabilityIndex:
+    """
+    In-process copy of every resource and its confirmed bookings and holds.
+
+    Confirmed bookings and holds on one resource never overlap (the
+    bookings_no_overlap constraint guarantees it), so a list sorted by start
+    time is also sorted by end time. "Is this resource free?" is then one bisect: O(log n) per
+    resource, no matter how much booking history piles up.
+
+    Only valid with a single worker process: other workers' writes are not seen.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self._resources: Dict[int, ResourceResponse] = {}
+        self._intervals: Dict[int, List[Interval]] = {}
+        self._starts: Dict[int, List[datetime]] = {}
+        # booking_id -> expires_at, for the holds among the intervals
+        self._hold_expiry: Dict[int, datetime] = {}
+
+    # --- 1. LOADING ---
+    async def load(self, db: AsyncSession):
+        """
+        (Re)build the index from the database and swap it in atomically.
+        """
+        resources = (await db.execute(select(Resource))).scalars().all()
+        rows = await db.execute(
+            select(Booking.resource_id, Booking.start_time, Booking.end_time, Booking.id, Booking.expires_at)
+            .where(occupies_slot())
+            .order_by(Booking.resource_id, Booking.start_time)
+        )
+
+        intervals: Dict[int, List[Interval]] = {r.id: [] for r in resources}
+        hold_expiry: Dict[int, datetime] = {}
+        for resource_id, start, end, booking_id, expires_at in rows:
+            intervals.setdefault(resource_id, []).append((ensure_aware(start), ensure_aware(end), booking_id))
+            if expires_at is not None:
+                hold_expiry[booking_id] = ensure_aware(expires_at)
+
+        # No awaits below this point, so readers never see a half-built index
+        self._resources = {r.id: ResourceResponse.model_validate(r) for r in resources}
+        self._intervals = intervals
+        self._starts = {rid: [i[0] for i in items] for rid, items in intervals.items()}
+        self._hold_expiry = hold_expiry
+        self.loaded = True
+
+    # --- 2. IN-PLACE UPDATES (called after a successful commit) ---
+    def add_resource(self, resource: Resource):
+        self._resources[resource.id] = ResourceResponse.model_validate(resource)
+        self._intervals.setdefault(resource.id, [])
+        self._starts.setdefault(resource.id, [])
+
+    def add_booking(self, booking: Booking):
+        if booking.status not in ("confirmed", "held"):
+            return
+        if booking.status == "held":
+            self._hold_expiry[booking.id] = ensure_aware(booking.expires_at)
+        item = (ensure_aware(booking.start_time), ensure_aware(booking.end_time), booking.id)
+        items = self._intervals.setdefault(booking.resource_id, [])
+        starts = self._starts.setdefault(booking.resource_id, [])
+        pos = bisect_left(items, item)
+        items.insert(pos, item)
+        starts.insert(pos, item[0])
+
+    def confirm_hold(self, booking: Booking):
+        self._hold_expiry.pop(booking.id, None)
+
+    def remove_booking(self, booking: Booking):
+        self._hold_expiry.pop(booking.id, None)
+        items = self._intervals.get(booking.resource_id, [])
+        item = (ensure_aware(booking.start_time), ensure_aware(booking.end_time), booking.id)
+        pos = bisect_left(items, item)
+        if pos < len(items) and items[pos] == item:
+            del items[pos]
+            del self._starts[booking.resource_id][pos]
+
+    # --- 3. QUERIES ---
+    def is_free(self, resource_id: int, start_time: datetime, end_time: datetime) -> bool:
+        """
+        Overlap Logic: (ExistingStart < RequestedEnd) AND (ExistingEnd > RequestedStart).
+        Only the last booking starting before RequestedEnd can overlap, unless
+        it is a lapsed hold: then look at the one before it, and so on.
+        """
+        starts = self._starts.get(resource_id)
+        if not starts:
+            return True
+        start_time = ensure_aware(start_time)
+        pos = bisect_left(starts, ensure_aware(end_time))
+        now = None
+        while pos > 0:
+            _, end, booking_id = self._intervals[resource_id][pos - 1]
+            if end <= start_time:
+                return True
+            expires_at = self._hold_expiry.get(booking_id)
+            if expires_at is None:
+                return False
+            now = now or datetime.now(timezone.utc)
+            if expires_at > now:
+                return False
+            pos -= 1
+        return True
+
+    def available(self, start_time: datetime, end_time: datetime, min_capacity: int) -> List[ResourceResponse]:
+        return [
+            resource
+            for resource in self._resources.values()
+            if resource.is_active
+            and resource.capacity >= min_capacity
+            and self.is_free(resource.id, start_time, end_time)
+        ]
+
+    # --- 4. CONSISTENCY CHECK ---
+    async def check(self, db: AsyncSession, repair: bool = False) -> dict:
+        """
+        Compare the index with a fresh read of the database.
+        Returns the resource IDs whose bookings or details differ.
+        """
+        fresh = AvailabilityIndex()
+        await fresh.load(db)
+
+        resource_ids = set(self._resources) | set(fresh._resources)
+        drifted = sorted(
+            rid for rid in resource_ids
+            if self._resources.get(rid) != fresh._resources.get(rid)
+            or self._intervals.get(rid, []) != fresh._intervals.get(rid, [])
+        )
+
+        if drifted and repair:
+            self._resources, self._intervals, self._starts = fresh._resources, fresh._intervals, fresh._starts
+            self._hold_expiry = fresh._hold_expiry
+            self.loaded = True
+
+        return {
+            "consistent": not drifted,
+            "drifted_resource_ids": drifted,
+            "resources": len(fresh._resources),
+            "bookings": sum(len(items) for items in fresh._intervals.values()),
+            "repaired": bool(drifted and repair),
+        }
+
+
+availability_index = AvailabilityIndex()
@@ -0,0 +1,81 @@
+import base64
+import re
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SLOT_PATTERN = re.compile(r"^(\d+)([mh])$")
+
+
+def parse_slot(slot: str) -> timedelta:
+    """
+    "15m" -> 15 minutes, "1h" -> 1 hour. Raises ValueError otherwise.
+    """
+    match = SLOT_PATTERN.match(slot.strip().lower())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError("slot must look like 15m or 1h")
+    amount, unit = int(match.group(1)), match.group(2)
+    return timedelta(minutes=amount) if unit == "m" else timedelta(hours=amount)
+
+
+def merge_ranges(ranges: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[Tuple[int, int]] = []
+    for lo, hi in sorted(ranges):
+        if lo >= hi:
+            continue
+        if merged and lo <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+        else:
+            merged.append((lo, hi))
+    return merged
+
+
+def encode_bitset(ranges: List[Tuple[int, int]], slots: int) -> str:
+    """
+    Busy slots as a base64 bitset, LSB-first: slot i is bit (i % 8) of byte (i // 8).
+    Each busy run is one shift-and-OR on a Python int, so the cost is per
+    booking, not per slot, and overlapping runs need no merging.
+    """
+    bits = 0
+    for lo, hi in ranges:
+        bits |= ((1 << (hi - lo)) - 1) << lo
+    return base64.b64encode(bits.to_bytes((slots + 7) // 8, "little")).decode()
+
+
+def encode_rle(ranges: List[Tuple[int, int]], slots: int) -> List[int]:
+    """
+    Alternating run lengths, starting with a FREE run (possibly 0):
+    [2, 3, 5] = 2 free, 3 busy, 5 free.
+    """
+    ranges = merge_ranges(ranges)
+    runs: List[int] = []
+    cursor = 0
+    for lo, hi in ranges:
+        runs += [lo - cursor, hi - lo]
+        cursor = hi
+    if cursor < slots:
+        runs.append(slots - cursor)
+    return runs
+
+
+def build_grid(rows: Iterable[Tuple[int, str, Optional[int], Optional[int]]], slots: int, encoding: str) -> List[dict]:
+    """
+    Rasterize (resource_id, name, first_slot, end_slot) rows into one encoded
+    free/busy line per resource. The slot numbers are computed by Postgres
+    (see crud_resource.get_busy_slot_rows), so this loop only does integer work.
+    Rows with NULL slots (no bookings) still produce an all-free line.
+    """
+    names: Dict[int, str] = {}
+    busy: Dict[int, List[Tuple[int, int]]] = {}
+    for resource_id, name, lo, hi in rows:
+        ranges = busy.get(resource_id)
+        if ranges is None:
+            ranges = busy[resource_id] = []
+            names[resource_id] = name
+        if lo is not None:
+            ranges.append((lo, hi))
+
+    encode = encode_bitset if encoding == "bitset" else encode_rle
+    return [
+        {"resource_id": resource_id, "name": names[resource_id], "busy": encode(busy[resource_id], slots)}
+        for resource_id in sorted(busy)
+    ]
@@ -0,0 +1,96 @@
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Hashable, Optional
+from app.core.config import settings
+
+
+@dataclass(frozen=True)
+class CatalogPage:
+    version: int
+    body: bytes
+    etag: str
+    next_cursor: Optional[str]
+    expires_at: float
+
+
+class CatalogCache:
+    """
+    Pre-serialized pages of GET /resources/, tagged with a catalog version.
+
+    Every write to the resource table calls bump(): the version moves on and
+    all pages are dropped. Between writes, repeat requests are served from
+    memory and `If-None-Match` revalidations are answered with 304, neither
+    touching the database.
+
+    The version is per process, so with several workers a write is only seen
+    by the others once their pages expire (`ttl`).
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = 0
+        self._pages: "OrderedDict[Hashable, CatalogPage]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[CatalogPage]:
+        page = self._pages.get(key)
+        if page is None or page.version != self.version or page.expires_at < time.monotonic():
+            self.misses += 1
+            return None
+        self._pages.move_to_end(key)
+        self.hits += 1
+        return page
+
+    def put(self, key: Hashable, version: int, body: bytes, next_cursor: Optional[str]) -> CatalogPage:
+        """
+        Store a page built from a read that started at `version`.
+        If the catalog changed meanwhile the page is returned but not cached.
+        """
+        # Content hash, not the version: identical pages get identical tags on every worker
+        page = CatalogPage(
+            version=version,
+            body=body,
+            etag='"' + hashlib.sha256(body).hexdigest()[:32] + '"',
+            next_cursor=next_cursor,
+            expires_at=time.monotonic() + self.ttl,
+        )
+        if version == self.version and self.maxsize > 0:
+            self._pages[key] = page
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.maxsize:
+                self._pages.popitem(last=False)
+        return page
+
+    def bump(self):
+        self.version += 1
+        self._pages.clear()
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "pages": len(self._pages),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+catalog_cache = CatalogCache(
+    maxsize=settings.CATALOG_CACHE_PAGES,
+    ttl=settings.CATALOG_CACHE_TTL_SECONDS,
+)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    RFC 9110 If-None-Match: a list of tags, or "*". Weak comparison, as GET allows.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in tags)
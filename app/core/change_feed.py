@@ -0,0 +1,194 @@
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import Iterable, List, Optional, Set
+from sqlalchemy import text, bindparam, ARRAY, Text
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Postgres NOTIFY channel carrying booking changes
+CHANNEL = "booking_changes"
+
+# One NOTIFY per event, all in a single statement (and the writer's transaction)
+_NOTIFY = text(
+    "SELECT pg_notify(:channel, payload) FROM unnest(:payloads) AS payload"
+).bindparams(bindparam("payloads", type_=ARRAY(Text)))
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def encode_event(op: str, booking) -> str:
+    """
+    Compact change event: {"op":"created","id":1,"resource_id":2,"start_time":..,"end_time":..}
+    Who booked is left out on purpose, every subscriber sees every event.
+    """
+    return json.dumps(
+        {
+            "op": op,
+            "id": booking.id,
+            "resource_id": booking.resource_id,
+            "start_time": _plain(booking.start_time),
+            "end_time": _plain(booking.end_time),
+        },
+        separators=(",", ":"),
+    )
+
+
+async def publish(db: AsyncSession, op: str, bookings: Iterable):
+    """
+    Queue change events in the current transaction. Postgres only delivers
+    them on COMMIT, so a rolled back write never shows up in the feed.
+    """
+    if not settings.CHANGE_FEED_ENABLED:
+        return
+    payloads = [encode_event(op, b) for b in bookings]
+    if payloads:
+        await db.execute(_NOTIFY, {"channel": CHANNEL, "payloads": payloads})
+
+
+class Subscription:
+    """
+    One listener's bounded buffer. If it fills up the consumer is too slow:
+    the buffer is emptied and replaced by a single None, which ends the stream.
+    """
+
+    def __init__(self, resource_ids: Optional[Set[int]], maxsize: int):
+        self.resource_ids = resource_ids
+        self.queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue(maxsize=maxsize)
+        self.dropped = False
+
+    def wants(self, resource_id: int) -> bool:
+        return self.resource_ids is None or resource_id in self.resource_ids
+
+    def offer(self, payload: str) -> bool:
+        try:
+            self.queue.put_nowait(payload)
+            return True
+        except asyncio.QueueFull:
+            self.close()
+            return False
+
+    def close(self):
+        if self.dropped:
+            return
+        self.dropped = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    async def get(self, timeout: float) -> Optional[str]:
+        """
+        Next payload, "" when nothing arrived within `timeout` (time for a
+        keep-alive), None once the subscription has been dropped.
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return ""
+
+
+class ChangeFeed:
+    """
+    Fans NOTIFY events out to this worker's subscribers.
+
+    One LISTEN connection per worker process, opened when the first client
+    subscribes, outside the regular pool so it never takes a slot from
+    request handlers. If that connection dies every subscriber is dropped
+    (SSE clients reconnect on their own) and the next subscribe reconnects.
+    """
+
+    def __init__(self):
+        self._engine = None
+        self._conn = None
+        self._lock = asyncio.Lock()
+        self._subscribers: List[Subscription] = []
+        self.events_received = 0
+        self.events_delivered = 0
+        self.subscribers_dropped = 0
+
+    @property
+    def listening(self) -> bool:
+        return self._conn is not None
+
+    async def _listen(self):
+        if self._engine is None:
+            self._engine = create_async_engine(settings.ASYNC_DATABASE_URL, poolclass=NullPool)
+        conn = await self._engine.connect()
+        raw = (await conn.get_raw_connection()).driver_connection
+        raw.add_termination_listener(self._on_terminated)
+        await raw.add_listener(CHANNEL, self._on_notify)
+        self._conn = conn
+
+    def _on_notify(self, connection, pid, channel, payload: str):
+        self.events_received += 1
+        try:
+            resource_id = json.loads(payload)["resource_id"]
+        except (ValueError, KeyError):
+            logger.warning("Ignoring malformed %s payload: %r", CHANNEL, payload)
+            return
+        for sub in list(self._subscribers):
+            if not sub.wants(resource_id):
+                continue
+            if sub.offer(payload):
+                self.events_delivered += 1
+            else:
+                self._remove(sub, dropped=True)
+
+    def _on_terminated(self, connection):
+        logger.warning("%s LISTEN connection lost, dropping %d subscribers", CHANNEL, len(self._subscribers))
+        self._conn = None
+        for sub in list(self._subscribers):
+            sub.close()
+            self._remove(sub, dropped=True)
+
+    def _remove(self, sub: Subscription, dropped: bool = False):
+        if sub in self._subscribers:
+            self._subscribers.remove(sub)
+            if dropped:
+                self.subscribers_dropped += 1
+
+    async def subscribe(self, resource_ids: Optional[Iterable[int]] = None) -> Optional[Subscription]:
+        """
+        New subscription, optionally limited to some resources.
+        None when this worker already serves CHANGE_FEED_MAX_SUBSCRIBERS.
+        """
+        if len(self._subscribers) >= settings.CHANGE_FEED_MAX_SUBSCRIBERS:
+            return None
+        async with self._lock:
+            if self._conn is None:
+                await self._listen()
+        sub = Subscription(set(resource_ids) if resource_ids else None, settings.CHANGE_FEED_BUFFER)
+        self._subscribers.append(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        self._remove(sub)
+
+    async def stop(self):
+        for sub in list(self._subscribers):
+            sub.close()
+        self._subscribers.clear()
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            await conn.close()
+        if self._engine is not None:
+            await self._engine.dispose()
+            self._engine = None
+
+    def stats(self) -> dict:
+        return {
+            "listening": self.listening,
+            "subscribers": len(self._subscribers),
+            "events_received": self.events_received,
+            "events_delivered": self.events_delivered,
+            "subscribers_dropped": self.subscribers_dropped,
+        }
+
+
+change_feed = ChangeFeed()
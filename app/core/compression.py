@@ -0,0 +1,42 @@
+"""
+gzip that keeps entity tags honest.
+
+Starlette's GZipMiddleware compresses a response but leaves its ETag alone,
+so the gzipped and the identity body of GET /resources/ went out under the
+same strong tag, and only compressed responses carried Vary: Accept-Encoding.
+A shared cache could then hand gzip to a client that never asked for it, or
+treat two different byte sequences as one strong validator.
+"""
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import Message, Receive, Scope, Send
+
+
+class ETagAwareGZipMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware, plus for every response that has an ETag:
+    - Vary: Accept-Encoding, whether or not this one was compressed (or is a 304)
+    - the ETag weakened (W/"...") for clients accepting gzip: their body may be
+      the compressed one, and a weak tag only promises the same content. The
+      tag they send back still matches (catalog_cache.etag_matches compares weakly).
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":  # pragma: no cover
+            await super().__call__(scope, receive, send)
+            return
+
+        accepts_gzip = "gzip" in Headers(scope=scope).get("Accept-Encoding", "")
+
+        async def send_with_validators(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                etag = headers.get("etag")
+                if etag is not None:
+                    if "accept-encoding" not in headers.get("vary", "").lower():
+                        headers.add_vary_header("Accept-Encoding")
+                    if accepts_gzip and not etag.startswith("W/"):
+                        headers["ETag"] = "W/" + etag
+            await send(message)
+
+        await super().__call__(scope, receive, send_with_validators)
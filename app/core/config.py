@@ -1,4 +1,5 @@
 import os
+from typing import Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import computed_field
 
@@ -18,19 +19,134 @@ class Settings(BaseSettings):
     POSTGRES_DB: str = os.getenv("POSTGRES_DB", "booking_db")
     POSTGRES_PORT: str = os.getenv("POSTGRES_PORT", "5432")
 
+    # Optional read replica for GET endpoints (see deps.get_read_db)
+    DATABASE_REPLICA_URL: str | None = os.getenv("DATABASE_REPLICA_URL")
+    # Replica lagging more than this -> reads go to the primary
+    REPLICA_MAX_LAG_SECONDS: float = 5.0
+    REPLICA_HEALTH_CHECK_SECONDS: float = 5.0
+    # A health check slower than this marks the replica unhealthy (reads -> primary)
+    REPLICA_HEALTH_CHECK_TIMEOUT_SECONDS: float = 1.0
+    # After a write, that user's reads stay on the primary for this long
+    READ_YOUR_WRITES_SECONDS: float = 10.0
+
+    # Engine / connection pool. Keep workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+    # below Postgres max_connections.
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # Connections opened at startup (capped at DB_POOL_SIZE)
+    DB_POOL_WARMUP: int = 2
+
+    # Request/query latency metrics, served at /metrics
+    METRICS_ENABLED: bool = True
+
+    # In-memory availability index for /resources/search (see app/core/availability.py)
+    # Only turn this on when running a single worker process
+    AVAILABILITY_INDEX_ENABLED: bool = False
+
+    # Resource catalog (GET /resources/) cache: pages kept, how long a page may be
+    # served without re-reading (bounds staleness across workers), client max-age
+    CATALOG_CACHE_PAGES: int = 256
+    CATALOG_CACHE_TTL_SECONDS: float = 30.0
+    CATALOG_CLIENT_MAX_AGE: int = 0
+
+    # Upper bound on slots per line in /resources/availability-grid (a week of 15m slots is 672)
+    AVAILABILITY_GRID_MAX_SLOTS: int = 4032
+
+    # Max number of bookings accepted by POST /bookings/batch
+    BOOKING_BATCH_MAX_SIZE: int = 500
+
+    # Max occurrences a single recurrence rule may expand to
+    RECURRENCE_MAX_OCCURRENCES: int = 500
+
+    # Rows fetched per server-side cursor round trip in /bookings/export
+    EXPORT_CHUNK_SIZE: int = 1000
+
+    # List endpoints (bookings, resources, search, users): fetch plain rows and
+    # serialize them once through a prebuilt TypeAdapter (app/core/fast_json.py)
+    # instead of validating ORM objects through response_model. Same JSON, less CPU
+    FAST_JSON_RESPONSES: bool = False
+
+    # gzip responses of at least GZIP_MINIMUM_SIZE bytes for clients sending
+    # Accept-Encoding: gzip. Level 1-9: on a 1000-booking page (~200 KB) 5 compresses
+    # ~12x for ~3 ms of CPU, 9 only ~15x for ~16 ms (benchmarks.micro -k list_response)
+    GZIP_ENABLED: bool = True
+    GZIP_MINIMUM_SIZE: int = 1024
+    GZIP_COMPRESS_LEVEL: int = 5
+
+    # Live change feed at /bookings/stream (Postgres LISTEN/NOTIFY). Per worker:
+    # max concurrent subscribers, events buffered per subscriber before it is
+    # dropped as too slow, idle seconds between SSE keep-alives
+    CHANGE_FEED_ENABLED: bool = True
+    CHANGE_FEED_MAX_SUBSCRIBERS: int = 1000
+    CHANGE_FEED_BUFFER: int = 256
+    CHANGE_FEED_KEEPALIVE_SECONDS: float = 15.0
+
+    # Idempotency-Key on POST /bookings/: how long a finished response is replayed,
+    # and how long an in-flight claim blocks retries if its request dies
+    IDEMPOTENCY_TTL_SECONDS: float = 86400.0
+    IDEMPOTENCY_LOCK_SECONDS: float = 60.0
+    # How often expired keys are deleted
+    IDEMPOTENCY_PURGE_INTERVAL_SECONDS: float = 3600.0
+
+    # Booking holds (POST /bookings/hold): default and max hold length, and how
+    # often / in what batch size the background sweeper expires lapsed holds
+    BOOKING_HOLD_SECONDS: int = 300
+    BOOKING_HOLD_MAX_SECONDS: int = 1800
+    HOLD_SWEEP_INTERVAL_SECONDS: float = 15.0
+    HOLD_SWEEP_BATCH_SIZE: int = 1000
+
+    # Waitlist entries considered per promotion run after a slot frees up
+    WAITLIST_PROMOTION_BATCH: int = 100
+
+    # Bookings are range-partitioned by month (app/db/partitions.py): months
+    # bookable ahead (partitions exist one month further), and how often to create new ones
+    BOOKINGS_PARTITIONS_AHEAD: int = 24
+    BOOKINGS_PARTITION_MAINTENANCE_INTERVAL_SECONDS: float = 86400.0
+
+    # POST /bookings/auto: how many rooms to try when a plain booking races us
+    AUTO_BOOK_MAX_ATTEMPTS: int = 3
+
+    # Authenticated-principal cache used by deps.get_current_user
+    # Set either to 0 to always hit the database
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 60.0
+
+    # Password hashing: bcrypt cost and the worker pool it runs on
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_EXECUTOR: Literal["thread", "process"] = "thread"
+    PASSWORD_HASH_WORKERS: int = 4
+    # Waiting hash requests beyond this get a 503 (0 = no limit)
+    PASSWORD_HASH_MAX_QUEUE: int = 256
+
+    @staticmethod
+    def _async_url(url: str) -> str:
+        # Ensure it uses the async driver prefix
+        if url.startswith("postgresql://"):
+            return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+        return url
+
     @computed_field
     @property
     def ASYNC_DATABASE_URL(self) -> str:
         # 1. Use DATABASE_URL if provided by Render
         if self.DATABASE_URL:
-            # Ensure it uses the async driver prefix
-            if self.DATABASE_URL.startswith("postgresql://"):
-                return self.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
-            return self.DATABASE_URL
+            return self._async_url(self.DATABASE_URL)
         
         # 2. Otherwise, build it from parts (Local/Docker Desktop)
         return f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
 
+    @computed_field
+    @property
+    def ASYNC_REPLICA_DATABASE_URL(self) -> str | None:
+        if self.DATABASE_REPLICA_URL:
+            return self._async_url(self.DATABASE_REPLICA_URL)
+        return None
+
     model_config = SettingsConfigDict(
         env_file=".env",
         case_sensitive=True,
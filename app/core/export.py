@@ -0,0 +1,37 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Sequence
+
+# Column order of every export, CSV header included
+EXPORT_COLUMNS = ("id", "user_id", "resource_id", "start_time", "end_time", "status", "created_at", "series_id")
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def csv_header() -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(EXPORT_COLUMNS)
+    return buffer.getvalue().encode()
+
+
+def csv_chunk(rows: Sequence[Sequence]) -> bytes:
+    """
+    One partition of rows as CSV lines. The buffer only ever holds one
+    partition, so memory stays flat however long the export is.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_plain(v) for v in row])
+    return buffer.getvalue().encode()
+
+
+def ndjson_chunk(rows: Sequence[Sequence]) -> bytes:
+    return "".join(
+        json.dumps(dict(zip(EXPORT_COLUMNS, (_plain(v) for v in row))), separators=(",", ":")) + "\n"
+        for row in rows
+    ).encode()
@@ -0,0 +1,65 @@
+from functools import lru_cache
+from typing import List, Optional, Sequence, Type
+from fastapi import HTTPException, Response
+from pydantic import BaseModel, TypeAdapter
+from typing_extensions import TypedDict
+
+
+class RowSerializer:
+    """
+    JSON list of plain rows (SQLAlchemy Row tuples, no ORM objects) shaped
+    like `model`, straight to bytes.
+
+    The rows come from our own database, so they are not validated again:
+    the prebuilt TypeAdapter over a TypedDict with the model's fields only
+    serializes them, in Rust, once. Output matches what `response_model`
+    would produce for the same data, for a fraction of the CPU.
+    """
+
+    def __init__(self, model: Type[BaseModel], fields: Optional[Sequence[str]] = None):
+        self.model = model
+        self.fields = tuple(fields or model.model_fields)
+        row_type = TypedDict(
+            f"{model.__name__}Row",
+            {name: model.model_fields[name].annotation for name in self.fields},
+        )
+        self.adapter = TypeAdapter(List[row_type])
+
+    def columns(self, entity, *keys: str) -> list:
+        """
+        The mapped columns to SELECT from `entity` for these fields, in order,
+        plus `keys` (e.g. the pagination key) when missing. Extra columns are
+        fetched but left out of the JSON.
+        """
+        names = self.fields + tuple(key for key in keys if key not in self.fields)
+        return [getattr(entity, name) for name in names]
+
+    def pick(self, fields: Optional[str]) -> "RowSerializer":
+        """
+        Serializer for a `?fields=a,b` sparse fieldset: just those fields, in
+        the model's order. Built once per distinct set; self when `fields` is
+        empty, 400 on unknown names.
+        """
+        wanted = {name.strip() for name in (fields or "").split(",")} - {""}
+        if not wanted:
+            return self
+        unknown = wanted.difference(self.fields)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown field(s): {', '.join(sorted(unknown))}")
+        return _subset(self.model, tuple(name for name in self.fields if name in wanted))
+
+    def dump_json(self, rows: Sequence) -> bytes:
+        return self.adapter.dump_json([row._asdict() for row in rows])
+
+
+# One serializer (TypedDict + TypeAdapter) per model and field set
+_subset = lru_cache(maxsize=256)(RowSerializer)
+
+
+def json_response(body: bytes, response: Optional[Response] = None) -> Response:
+    """
+    Raw JSON response, keeping headers already set on the endpoint's
+    injected `response` (e.g. X-Next-Cursor).
+    """
+    headers = dict(response.headers) if response is not None else None
+    return Response(content=body, media_type="application/json", headers=headers)
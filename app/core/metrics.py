@@ -0,0 +1,260 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from starlette.routing import Match
+
+# --- 1. MINIMAL PROMETHEUS REGISTRY ---
+# Just enough of the text exposition format for counters, gauges and histograms.
+# Everything is updated from the event loop thread, so no locks.
+
+LabelValues = Tuple[str, ...]
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_labels(self.labelnames, k)} {v}" for k, v in self._values.items()
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str):
+        self._values[labels] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Tuple[float, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [count per bucket..., +Inf count], sum
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1][0] += value
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total[0]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class StatsGauges(Metric):
+    """
+    Exposes every numeric value of an existing stats() dict as a gauge,
+    read at scrape time: {"checked_out": 3} -> db_pool_checked_out 3
+    """
+    kind = "gauge"
+
+    def __init__(self, prefix: str, documentation: str, stats: Callable[[], dict]):
+        super().__init__(prefix, documentation)
+        self.stats = stats
+
+    def render(self) -> List[str]:
+        lines = []
+        for key, value in self.stats().items():
+            if isinstance(value, (int, float)):
+                name = f"{self.name}_{key}"
+                lines += [f"# HELP {name} {self.documentation}", f"# TYPE {name} gauge", f"{name} {float(value)}"]
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 4, 5, 8, 13, 21, 34)
+
+HTTP_REQUESTS = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route and status code.", ("method", "route", "status")))
+HTTP_LATENCY = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ("method", "route"), LATENCY_BUCKETS))
+HTTP_IN_FLIGHT = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served."))
+REQUEST_DB_TIME = registry.register(Histogram(
+    "http_request_db_duration_seconds", "Time spent in SQL per HTTP request.", ("method", "route"), LATENCY_BUCKETS))
+REQUEST_DB_STATEMENTS = registry.register(Histogram(
+    "http_request_db_statements", "SQL statements (round trips) per HTTP request.", ("method", "route"), STATEMENT_BUCKETS))
+DB_STATEMENTS = registry.register(Counter(
+    "db_statements_total", "SQL statements executed."))
+DB_TIME = registry.register(Counter(
+    "db_statement_duration_seconds_total", "Total time spent executing SQL."))
+
+
+# --- 2. PER-REQUEST DB ACCOUNTING ---
+
+class RequestDbStats:
+    __slots__ = ("statements", "seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+
+
+# Set by the middleware; SQLAlchemy runs its sync events inside the request's context
+current_db_stats: ContextVar[Optional[RequestDbStats]] = ContextVar("current_db_stats", default=None)
+
+
+def instrument_engine(sync_engine):
+    """
+    Hook cursor execution on an engine to count statements and DB time,
+    both globally and for the request that issued them.
+    """
+    from sqlalchemy import event
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        DB_STATEMENTS.inc()
+        DB_TIME.inc(amount=elapsed)
+        stats = current_db_stats.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.seconds += elapsed
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        # A failed statement never reaches after_cursor_execute
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+
+
+# --- 3. ASGI MIDDLEWARE ---
+
+def _route_template(scope) -> str:
+    """
+    Label requests by route template (/api/v1/bookings/{booking_id}), never by
+    raw path, so label cardinality stays bounded.
+    """
+    route = scope.get("route")
+    if route is None:
+        app = scope.get("app")
+        for candidate in getattr(getattr(app, "router", None), "routes", []):
+            if candidate.matches(scope)[0] == Match.FULL:
+                route = candidate
+                break
+    template = getattr(route, "path_format", None) or getattr(route, "path", None)
+    if template is None:
+        return "<unmatched>"
+
+    # Routes of an included router may only know their own suffix ("/{booking_id}"):
+    # fill in the params and take whatever precedes it in the real path as the prefix.
+    concrete = template
+    for name, value in scope.get("path_params", {}).items():
+        concrete = concrete.replace("{" + name + "}", str(value))
+    path = scope.get("path", "")
+    if concrete != path and path.endswith(concrete):
+        return path[: len(path) - len(concrete)] + template
+    return template
+
+
+class MetricsMiddleware:
+    """
+    Records latency, status codes, in-flight count and DB usage per route,
+    and adds a Server-Timing header so the numbers are visible per response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestDbStats()
+        token = current_db_stats.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+        HTTP_IN_FLIGHT.inc()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                headers = list(message.get("headers", []))
+                headers.append((
+                    b"server-timing",
+                    f"app;dur={elapsed_ms:.1f}, db;dur={stats.seconds * 1000:.1f};desc=\"{stats.statements} statements\"".encode(),
+                ))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            current_db_stats.reset(token)
+            method, route = scope["method"], _route_template(scope)
+            HTTP_REQUESTS.inc(method, route, str(status_code))
+            HTTP_LATENCY.observe(time.perf_counter() - started, method, route)
+            REQUEST_DB_TIME.observe(stats.seconds, method, route)
+            REQUEST_DB_STATEMENTS.observe(stats.statements, method, route)
@@ -0,0 +1,43 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Optional, Sequence, Tuple
+from fastapi import HTTPException, Response
+
+# Header carrying the cursor for the next page (body stays a plain list)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*key: Any) -> str:
+    """
+    Opaque, URL-safe cursor for a sort key, e.g. (start_time, id) or (id,).
+    """
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in key], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], *types: type) -> Optional[Tuple]:
+    """
+    Reverse of encode_cursor. `types` is the expected sort key shape,
+    e.g. decode_cursor(c, datetime, int). Bad cursors become a 400.
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError
+        return tuple(datetime.fromisoformat(v) if t is datetime else t(v) for t, v in zip(types, values))
+    except (ValueError, TypeError, binascii.Error, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def set_next_cursor(response: Response, rows: Sequence, limit: int, *key_attrs: str):
+    """
+    A full page means there may be more: hand out the last row's key as the next cursor.
+    """
+    if rows and len(rows) == limit:
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*(getattr(last, a) for a in key_attrs))
@@ -0,0 +1,29 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+def start_periodic(name: str, interval: float, job: Callable[[], Awaitable]) -> asyncio.Task:
+    """
+    Run `job` every `interval` seconds on the event loop until the task is cancelled.
+    A failing run is logged and retried on the next tick, never fatal.
+    """
+    async def loop():
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await job()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Periodic job %s failed", name)
+
+    return asyncio.create_task(loop(), name=name)
+
+
+async def stop_periodic(*tasks: asyncio.Task):
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
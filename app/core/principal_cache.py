@@ -0,0 +1,103 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+from sqlalchemy import event
+from app.core.config import settings
+from app.models.user import User
+
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    What an authenticated request needs to know about its user.
+    Cheap to cache, unlike a live ORM object bound to a session.
+    """
+    id: int
+    email: str
+    is_active: bool
+    is_superuser: bool
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            is_active=bool(user.is_active),
+            is_superuser=bool(user.is_superuser),
+        )
+
+
+class PrincipalCache:
+    """
+    Bounded LRU of Principals keyed by user id, each entry living at most `ttl` seconds.
+    All access happens on the event loop thread, so no locking is needed.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, tuple[float, Principal]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl > 0
+
+    def get(self, user_id: int) -> Optional[Principal]:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, principal: Principal):
+        if not self.enabled:
+            return
+        self._entries[principal.id] = (time.monotonic() + self.ttl, principal)
+        self._entries.move_to_end(principal.id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, user_id: int):
+        if self._entries.pop(user_id, None) is not None:
+            self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+principal_cache = PrincipalCache(
+    maxsize=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
+
+
+# Any ORM write to a user row drops its cached snapshot.
+# Raw SQL updates (e.g. the README's superuser promotion) are bounded by the TTL instead.
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_principal(mapper, connection, target):
+    principal_cache.invalidate(target.id)
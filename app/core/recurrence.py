@@ -0,0 +1,79 @@
+import calendar
+from datetime import datetime, timedelta
+from typing import List, Sequence, Tuple
+from app.core.availability import ensure_aware
+from app.schemas.booking import RecurrenceRule
+
+# (start_time, end_time)
+Slot = Tuple[datetime, datetime]
+
+
+def _nth_start(first: datetime, rule: RecurrenceRule, n: int) -> datetime | None:
+    """
+    Start of the n-th period after `first`, or None when that month has no such day
+    (e.g. the 31st in April). Like RFC 5545, skipped dates do not count towards COUNT.
+    """
+    if rule.freq == "daily":
+        return first + timedelta(days=n * rule.interval)
+    if rule.freq == "weekly":
+        return first + timedelta(weeks=n * rule.interval)
+
+    months = first.month - 1 + n * rule.interval
+    year, month = first.year + months // 12, months % 12 + 1
+    if first.day > calendar.monthrange(year, month)[1]:
+        return None
+    return first.replace(year=year, month=month)
+
+
+def expand(start_time: datetime, end_time: datetime, rule: RecurrenceRule, max_occurrences: int) -> List[Slot]:
+    """
+    Expand an RRULE-style rule into sorted (start, end) slots.
+    Raises ValueError when the series is too long or overlaps itself.
+    """
+    start_time, end_time = ensure_aware(start_time), ensure_aware(end_time)
+    duration = end_time - start_time
+    until = ensure_aware(rule.until) if rule.until else None
+    excluded = {ensure_aware(d) for d in rule.exdates}
+
+    slots: List[Slot] = []
+    produced = 0
+    # Hard stop for rules that keep landing on missing days
+    for n in range(max_occurrences * 12):
+        start = _nth_start(start_time, rule, n)
+        if start is None:
+            continue
+        if until and start > until:
+            break
+        if rule.count and produced >= rule.count:
+            break
+        produced += 1
+        if start in excluded:
+            continue
+        if len(slots) == max_occurrences:
+            raise ValueError(f"Recurrence expands to more than {max_occurrences} occurrences")
+        slots.append((start, start + duration))
+
+    for (_, prev_end), (next_start, _) in zip(slots, slots[1:]):
+        if prev_end > next_start:
+            raise ValueError("Occurrences overlap each other, shorten the booking or widen the interval")
+    return slots
+
+
+def sweep_conflicts(slots: Sequence[Slot], existing: Sequence[Slot]) -> List[int]:
+    """
+    Indexes of `slots` that overlap any of `existing`.
+
+    Both lists are sorted and free of self-overlap (confirmed bookings never
+    overlap, and expand() rejects series that do), so their end times are
+    sorted too and one merge-style pass is enough: O(n + m), no per-occurrence
+    query.
+    """
+    conflicts = []
+    j = 0
+    for i, (start, end) in enumerate(slots):
+        # Skip existing bookings that finish before this occurrence begins
+        while j < len(existing) and existing[j][1] <= start:
+            j += 1
+        if j < len(existing) and existing[j][0] < end:
+            conflicts.append(i)
+    return conflicts
@@ -1,11 +1,17 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Union, Any
+from typing import Optional, Tuple, Union, Any
+from fastapi import HTTPException
 from jose import jwt
 from passlib.context import CryptContext
 from app.core.config import settings
 
 # --- 1. HASHING ENGINE (What you already have) ---
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Changing BCRYPT_ROUNDS marks older hashes as outdated (needs_update),
+# and login rehashes them with the new cost.
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -13,6 +19,101 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+def verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    (valid?, new hash if the stored one uses an outdated cost factor).
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt (~200 ms of CPU per call) on a bounded worker pool so it never
+    blocks the event loop. At most `workers` hashes run at once; callers beyond
+    that wait in line, and past `max_queue` waiting callers we answer 503
+    instead of letting a login storm pile up.
+    """
+
+    def __init__(self, workers: int, kind: str = "thread", max_queue: int = 0):
+        self.workers = workers
+        self.kind = kind
+        self.max_queue = max_queue
+        self._executor: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        # Metrics
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+            self._slots = asyncio.Semaphore(self.workers)
+        return self._executor
+
+    async def run(self, fn, *args):
+        executor = self._get_executor()
+        if self.max_queue and self.queued >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
+
+        self.queued += 1
+        started = time.monotonic()
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+        waited = time.monotonic() - started
+        self.wait_seconds_total += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+        self.running += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self._slots.release()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+            "running": self.running,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_seconds": round(self.wait_seconds_total / self.completed, 6) if self.completed else 0.0,
+            "max_wait_seconds": round(self.max_wait_seconds, 6),
+        }
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    kind=settings.PASSWORD_HASH_EXECUTOR,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+)
+
+# Async versions for request handlers: same results, off the event loop
+async def verify_and_update_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return await password_hasher.run(verify_and_update, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_hasher.run(get_password_hash, password)
+
 # --- 2. TOKEN ENGINE (What you are missing) ---
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
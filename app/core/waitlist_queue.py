@@ -0,0 +1,78 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (resource_id, start_time, end_time) -> number of waitlist entries promoted
+PromoteHandler = Callable[[int, datetime, datetime], Awaitable[int]]
+
+
+class WaitlistQueue:
+    """
+    Freed slots waiting for a waitlist promotion, drained by one background
+    task per worker so cancellations never wait for it.
+
+    Pending work is coalesced per resource: several cancellations on the same
+    resource before the worker gets to it become one promotion over the span
+    they cover. The queue is therefore bounded by the number of resources.
+    """
+
+    def __init__(self):
+        self._queue: "asyncio.Queue[int]" = asyncio.Queue()
+        self._pending: Dict[int, Tuple[datetime, datetime]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.enqueued = 0
+        self.runs = 0
+        self.promoted = 0
+        self.failures = 0
+
+    def enqueue(self, resource_id: int, start_time: datetime, end_time: datetime):
+        """
+        Called after a slot was freed (and committed). Never blocks. A no-op
+        until the worker is started, e.g. in scripts.
+        """
+        if self._task is None:
+            return
+        self.enqueued += 1
+        span = self._pending.get(resource_id)
+        if span is None:
+            self._pending[resource_id] = (start_time, end_time)
+            self._queue.put_nowait(resource_id)
+        else:
+            self._pending[resource_id] = (min(span[0], start_time), max(span[1], end_time))
+
+    def start(self, handler: PromoteHandler):
+        self._task = asyncio.create_task(self._run(handler), name="waitlist_promotion")
+
+    async def stop(self):
+        if self._task is not None:
+            task, self._task = self._task, None
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _run(self, handler: PromoteHandler):
+        while True:
+            resource_id = await self._queue.get()
+            start_time, end_time = self._pending.pop(resource_id)
+            self.runs += 1
+            try:
+                self.promoted += await handler(resource_id, start_time, end_time)
+            except Exception:
+                # The next cancellation on this resource gives it another go
+                self.failures += 1
+                logger.exception("Waitlist promotion failed for resource %s", resource_id)
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "pending": len(self._pending),
+            "enqueued": self.enqueued,
+            "runs": self.runs,
+            "promoted": self.promoted,
+            "failures": self.failures,
+        }
+
+
+waitlist_queue = WaitlistQueue()
@@ -1,63 +1,546 @@
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import and_, or_
-from app.models.booking import Booking
-from app.schemas.booking import BookingCreate
-
-async def get_multi(db: AsyncSession, skip: int = 0, limit: int = 100):
-    result = await db.execute(select(Booking).offset(skip).limit(limit))
-    return result.scalars().all()
-
-async def create_booking(db: AsyncSession, obj_in: BookingCreate, user_id: int):
-    # 1. CHECK FOR CONFLICTS (The most important part)
-    # Is there any existing booking for this room that overlaps with the requested time?
-    # Logic: (StartA < EndB) AND (EndA > StartB)
-    query = select(Booking).where(
-        and_(
-            Booking.resource_id == obj_in.resource_id,
-            Booking.status == "confirmed", # Only check active bookings
-            and_(
-                Booking.start_time < obj_in.end_time,
-                Booking.end_time > obj_in.start_time
-            )
-        )
-    )
-    result = await db.execute(query)
-    conflict = result.scalar_one_or_none()
+from sqlalchemy import and_, or_, func, literal, insert, update, delete, values, column, tuple_, Integer, DateTime
+from sqlalchemy.exc import DBAPIError
+from app.core import change_feed
+from app.core.availability import availability_index, ensure_aware
+from app.core.recurrence import Slot, sweep_conflicts
+from app.core.waitlist_queue import waitlist_queue
+from app.db.partitions import partition_floor
+from app.models.booking import Booking, BOOKING_OVERLAP_CONSTRAINT, archived_bookings, occupies_slot, overlapping
+from app.models.booking_series import BookingSeries
+from app.crud import crud_resource
+from app.schemas.booking import AutoBookingCreate, BookingCreate
+
+# SQLSTATE Postgres raises for an exclusion constraint violation
+EXCLUSION_VIOLATION = "23P01"
+# ...and for a deadlock, which is how two inserts of overlapping bookings can
+# meet in the GiST index: one of them is aborted, i.e. it lost the race
+DEADLOCK_DETECTED = "40P01"
 
-    if conflict:
-        return None # Room is taken!
+def is_overlap_violation(exc: DBAPIError) -> bool:
+    """
+    True if the error came from the booking overlap constraint (or a deadlock
+    between overlapping inserts).
+    """
+    orig = exc.orig
+    # asyncpg's own exception sits behind SQLAlchemy's DBAPI adapter
+    cause = getattr(orig, "__cause__", None)
+    sqlstate = getattr(orig, "sqlstate", None) or getattr(cause, "sqlstate", None)
+    if sqlstate in (EXCLUSION_VIOLATION, DEADLOCK_DETECTED):
+        return True
+    return BOOKING_OVERLAP_CONSTRAINT in str(orig)
+
+async def get_multi(
+    db: AsyncSession, skip: int = 0, limit: int = 100, after: Optional[Tuple] = None, columns: Optional[list] = None
+):
+    """
+    Bookings ordered by (start_time, id).
+    `after` is the keyset cursor (start_time, id) of the previous page's last row;
+    `skip` is the deprecated OFFSET fallback.
+    With `columns`, plain rows of just those columns instead of ORM objects.
+    """
+    query = (select(*columns) if columns else select(Booking)).order_by(Booking.start_time, Booking.id)
+    if after:
+        query = query.where(tuple_(Booking.start_time, Booking.id) > tuple_(*after))
+    else:
+        query = query.offset(skip)
+    result = await db.execute(query.limit(limit))
+    return result.all() if columns else result.scalars().all()
 
-    # 2. CREATE BOOKING
-    db_obj = Booking(
+async def create_booking(db: AsyncSession, obj_in: BookingCreate, user_id: int, hold_seconds: Optional[float] = None):
+    """
+    Book a slot, or with `hold_seconds` only hold it: status "held" until
+    confirm_hold() or until it lapses. Returns None if the slot is taken.
+    """
+    # 1. CREATE BOOKING
+    # No conflict SELECT up front: the per-partition exclusion constraints
+    # reject any confirmed booking that overlaps another on the same resource,
+    # atomically and off a GiST index. One INSERT, no race window, and
+    # RETURNING hands back the whole row (id, created_at, expires_at), so no
+    # refresh afterwards.
+    insert_booking = insert(Booking).values(
         user_id=user_id,
         resource_id=obj_in.resource_id,
         start_time=obj_in.start_time,
         end_time=obj_in.end_time,
-        status="confirmed"
+        status="held" if hold_seconds else "confirmed",
+        # Database clock, same as the sweeper and occupies_slot()
+        expires_at=func.now() + timedelta(seconds=hold_seconds) if hold_seconds else None
+    ).returning(Booking)
+    for attempt in range(2):
+        try:
+            db_obj = (await db.execute(insert_booking)).scalar_one()
+            # Delivered to /bookings/stream listeners only if the commit goes through
+            await change_feed.publish(db, "held" if hold_seconds else "created", [db_obj])
+            await db.commit()
+        except DBAPIError as exc:
+            await db.rollback()
+            # 2. CONFLICT? Room is taken! Anything else (e.g. bad resource_id) bubbles up.
+            if not is_overlap_violation(exc):
+                raise
+            # ...unless it is only taken by a lapsed hold the sweeper has not reached yet
+            if attempt or not await expire_holds(db, obj_in.resource_id, obj_in.start_time, obj_in.end_time):
+                return None
+            continue
+        if availability_index.loaded:
+            availability_index.add_booking(db_obj)
+        return db_obj
+
+# --- HOLDS ---
+
+async def confirm_hold(db: AsyncSession, booking_id: int, user_id: int):
+    """
+    Turn the caller's live hold into a confirmed booking, in one UPDATE.
+    The slot is already protected by the exclusion constraint, so this cannot conflict.
+    Returns None if there is no such live hold.
+    """
+    result = await db.execute(
+        update(Booking)
+        .where(
+            Booking.id == booking_id,
+            Booking.user_id == user_id,
+            Booking.status == "held",
+            Booking.expires_at > func.now()
+        )
+        .values(status="confirmed", expires_at=None)
+        .returning(Booking)
     )
-    db.add(db_obj)
+    booking = result.scalar_one_or_none()
+    if booking is None:
+        await db.rollback()
+        return None
+    await change_feed.publish(db, "confirmed", [booking])
     await db.commit()
-    await db.refresh(db_obj)
-    return db_obj
+    if availability_index.loaded:
+        availability_index.confirm_hold(booking)
+    return booking
 
-    # Deleting the Booking
+async def expire_holds(
+    db: AsyncSession,
+    resource_id: Optional[int] = None,
+    start_time=None,
+    end_time=None,
+    limit: Optional[int] = None
+) -> int:
+    """
+    Mark lapsed holds "expired" so their slots free up, and commit.
+    Either the ones overlapping one slot (a booking just tripped over them)
+    or, for the sweeper, up to `limit` of the oldest, found through the
+    partial ix_bookings_held_expires_at index. SKIP LOCKED keeps concurrent
+    sweepers and confirmations out of each other's way.
+    Returns how many holds were expired.
+    """
+    lapsed = select(Booking.id).where(
+        # Inlined, not bound: the planner can only match the partial index against a constant
+        Booking.status == literal("held", literal_execute=True),
+        Booking.expires_at <= func.now()
+    )
+    if resource_id is not None:
+        lapsed = lapsed.where(
+            Booking.resource_id == resource_id,
+            overlapping(start_time, end_time)
+        )
+    if limit:
+        lapsed = lapsed.order_by(Booking.expires_at).limit(limit)
+    lapsed = lapsed.with_for_update(skip_locked=True)
+
+    result = await db.execute(
+        update(Booking)
+        .where(Booking.id.in_(lapsed.scalar_subquery()))
+        .values(status="expired")
+        .returning(Booking.id, Booking.resource_id, Booking.start_time, Booking.end_time)
+        .execution_options(synchronize_session=False)
+    )
+    expired = result.all()
+    await change_feed.publish(db, "expired", expired)
+    await db.commit()
+    for row in expired:
+        if availability_index.loaded:
+            availability_index.remove_booking(row)
+        waitlist_queue.enqueue(row.resource_id, row.start_time, row.end_time)
+    return len(expired)
+
+async def expire_holds_over(db: AsyncSession, slots: Iterable[Tuple[int, datetime, datetime]]) -> int:
+    """
+    expire_holds() for many (resource_id, start, end) slots: one pass per
+    resource, over the span from its earliest start to its latest end.
+    Returns how many holds were expired.
+    """
+    spans: Dict[int, Tuple[datetime, datetime]] = {}
+    for resource_id, start, end in slots:
+        start, end = ensure_aware(start), ensure_aware(end)
+        lo, hi = spans.get(resource_id, (start, end))
+        spans[resource_id] = (min(lo, start), max(hi, end))
+    expired = 0
+    for resource_id, (start, end) in spans.items():
+        expired += await expire_holds(db, resource_id, start, end)
+    return expired
+
+async def sweep_expired_holds(db: AsyncSession, batch_size: int = 1000) -> int:
+    """
+    Expire every lapsed hold, one batch (and one short transaction) at a time.
+    """
+    total = 0
+    while True:
+        expired = await expire_holds(db, limit=batch_size)
+        total += expired
+        if expired < batch_size:
+            return total
+
+# --- AUTO-ASSIGN ---
+
+async def auto_book(db: AsyncSession, obj_in: AutoBookingCreate, user_id: int, max_attempts: int = 3):
+    """
+    Book whichever matching resource is free, best fit first.
+    Returns None when nothing matching is free.
+    """
+    for _ in range(max_attempts):
+        # 1. Pick + lock a candidate (skips rooms other callers hold)
+        resource = await crud_resource.lock_free_resource(
+            db,
+            start_time=obj_in.start_time,
+            end_time=obj_in.end_time,
+            min_capacity=obj_in.min_capacity,
+            type=obj_in.type,
+            location=obj_in.location
+        )
+        if resource is None:
+            await db.rollback()
+            return None
+
+        # 2. Book it; the commit releases the row lock
+        db_obj = Booking(
+            user_id=user_id,
+            resource_id=resource.id,
+            start_time=obj_in.start_time,
+            end_time=obj_in.end_time,
+            status="confirmed"
+        )
+        db.add(db_obj)
+        try:
+            await db.flush()
+            await change_feed.publish(db, "created", [db_obj])
+            await db.commit()
+        except DBAPIError as exc:
+            await db.rollback()
+            # A plain POST /bookings/ beat us to it (its FK check only takes FOR KEY SHARE
+            # on the room, which our lock lets through): try the next room
+            if is_overlap_violation(exc):
+                continue
+            raise
+        await db.refresh(db_obj)
+        if availability_index.loaded:
+            availability_index.add_booking(db_obj)
+        return db_obj
+    return None
+
+# --- BATCH CREATE ---
+
+async def find_conflicts(db: AsyncSession, candidates: List[Tuple[int, BookingCreate]]) -> Set[int]:
+    """
+    Indexes of the candidates that overlap an existing confirmed booking or live hold.
+    All candidates go to Postgres as one VALUES list joined against bookings,
+    so this is a single round trip however long the batch is.
+    """
+    if not candidates:
+        return set()
+    candidate_rows = values(
+        column("idx", Integer),
+        column("resource_id", Integer),
+        column("start_time", DateTime(timezone=True)),
+        column("end_time", DateTime(timezone=True)),
+        name="candidates",
+    ).data([(i, c.resource_id, c.start_time, c.end_time) for i, c in candidates])
+
+    query = select(candidate_rows.c.idx).join(
+        Booking,
+        and_(
+            Booking.resource_id == candidate_rows.c.resource_id,
+            occupies_slot(),
+            Booking.start_time < candidate_rows.c.end_time,
+            Booking.end_time > candidate_rows.c.start_time,
+            # Same partition bound as overlapping(), for the earliest candidate
+            Booking.start_time >= partition_floor(min(c.start_time for _, c in candidates))
+        )
+    ).distinct()
+    result = await db.execute(query)
+    return set(result.scalars().all())
+
+def find_batch_overlaps(candidates: List[Tuple[int, BookingCreate]]) -> Set[int]:
+    """
+    Indexes of candidates that overlap an EARLIER candidate in the same batch.
+    Earlier items win, so keep a sorted list of accepted slots per resource.
+    """
+    accepted: Dict[int, List[Tuple]] = {}
+    losers = set()
+    for i, c in candidates:
+        start, end = ensure_aware(c.start_time), ensure_aware(c.end_time)
+        slots = accepted.setdefault(c.resource_id, [])
+        pos = bisect_left(slots, (start, end))
+        # Neighbours on either side are the only ones that can overlap
+        before = slots[pos - 1] if pos > 0 else None
+        after = slots[pos] if pos < len(slots) else None
+        if (before and before[1] > start) or (after and after[0] < end):
+            losers.add(i)
+        else:
+            slots.insert(pos, (start, end))
+    return losers
 
-async def delete_booking(db: AsyncSession, booking_id: int):
-    # 1. Find the booking
-    query = select(Booking).where(Booking.id == booking_id)
+async def create_bookings_batch(
+    db: AsyncSession,
+    candidates: List[Tuple[int, BookingCreate]],
+    user_id: int,
+    atomic: bool = True
+):
+    """
+    Book many slots at once: one conflict query, one INSERT ... RETURNING.
+    Returns (created bookings by index, conflicting indexes), or None if a
+    concurrent booking won the race. In atomic mode nothing is inserted if
+    anything conflicts.
+    """
+    conflicts = find_batch_overlaps(candidates)
+    conflicts |= await find_conflicts(db, [(i, c) for i, c in candidates if i not in conflicts])
+    # Insert in (resource, start) order, so concurrent batches take the
+    # boundary guard's locks in the same order
+    winners = sorted(
+        ((i, c) for i, c in candidates if i not in conflicts),
+        key=lambda item: (item[1].resource_id, ensure_aware(item[1].start_time)),
+    )
+
+    if not winners or (atomic and conflicts):
+        await db.rollback()
+        return {}, conflicts
+
+    for attempt in range(2):
+        try:
+            result = await db.scalars(
+                insert(Booking).returning(Booking, sort_by_parameter_order=True),
+                [
+                    {
+                        "user_id": user_id,
+                        "resource_id": c.resource_id,
+                        "start_time": c.start_time,
+                        "end_time": c.end_time,
+                        "status": "confirmed",
+                    }
+                    for _, c in winners
+                ],
+            )
+            created = result.all()
+            await change_feed.publish(db, "created", created)
+            await db.commit()
+        except DBAPIError as exc:
+            await db.rollback()
+            if not is_overlap_violation(exc):
+                raise
+            # Someone else grabbed one of our slots between the check and the insert,
+            # unless it is only a lapsed hold (find_conflicts looks past those, the
+            # exclusion constraint does not): expire them and try once more
+            slots = [(c.resource_id, c.start_time, c.end_time) for _, c in winners]
+            if attempt or not await expire_holds_over(db, slots):
+                return None
+            continue
+        break
+
+    if availability_index.loaded:
+        for booking in created:
+            availability_index.add_booking(booking)
+    return {i: booking for (i, _), booking in zip(winners, created)}, conflicts
+
+# --- RECURRING BOOKINGS ---
+
+async def get_resource_intervals(db: AsyncSession, resource_id: int, start_time, end_time) -> List[Slot]:
+    """
+    All confirmed bookings and live holds of one resource inside a window, sorted by start.
+    Loaded once per series so the conflict check is a single query.
+    """
+    query = select(Booking.start_time, Booking.end_time).where(
+        and_(
+            Booking.resource_id == resource_id,
+            occupies_slot(),
+            overlapping(start_time, end_time)
+        )
+    ).order_by(Booking.start_time)
     result = await db.execute(query)
+    return [(ensure_aware(start), ensure_aware(end)) for start, end in result.all()]
+
+async def create_recurring(
+    db: AsyncSession,
+    obj_in: BookingCreate,
+    user_id: int,
+    slots: List[Slot],
+    unbookable: Sequence[int] = ()
+):
+    """
+    Book every expanded occurrence of a series.
+    `unbookable` occurrences are reported as conflicts without being looked up.
+    Returns (series, created bookings, conflicting slot indexes); series is None
+    when nothing was booked. Returns None if a concurrent booking won the race.
+    """
+    existing = await get_resource_intervals(db, obj_in.resource_id, slots[0][0], slots[-1][1])
+    conflicts = sorted(set(sweep_conflicts(slots, existing)) | set(unbookable))
+    if (conflicts and not obj_in.recurrence.skip_conflicts) or len(conflicts) == len(slots):
+        await db.rollback()
+        return None, [], conflicts
+
+    skipped = set(conflicts)
+    for attempt in range(2):
+        try:
+            series = BookingSeries(user_id=user_id, resource_id=obj_in.resource_id, rrule=obj_in.recurrence.to_rrule())
+            db.add(series)
+            await db.flush()
+            result = await db.scalars(
+                insert(Booking).returning(Booking, sort_by_parameter_order=True),
+                [
+                    {
+                        "user_id": user_id,
+                        "resource_id": obj_in.resource_id,
+                        "start_time": start,
+                        "end_time": end,
+                        "status": "confirmed",
+                        "series_id": series.id,
+                    }
+                    for i, (start, end) in enumerate(slots) if i not in skipped
+                ],
+            )
+            created = result.all()
+            await change_feed.publish(db, "created", created)
+            await db.commit()
+        except DBAPIError as exc:
+            await db.rollback()
+            if not is_overlap_violation(exc):
+                raise
+            # A lapsed hold get_resource_intervals() looked past? Expire, retry once
+            booked = [(obj_in.resource_id, start, end) for i, (start, end) in enumerate(slots) if i not in skipped]
+            if attempt or not await expire_holds_over(db, booked):
+                return None
+            continue
+        break
+
+    if availability_index.loaded:
+        for booking in created:
+            availability_index.add_booking(booking)
+    return series, created, conflicts
+
+async def cancel_series(db: AsyncSession, series_id: int, user_id: int):
+    """
+    Cancel every occurrence of a series in one DELETE. Only the owner's rows match.
+    """
+    result = await db.execute(
+        delete(Booking)
+        .where(Booking.series_id == series_id, Booking.user_id == user_id)
+        .returning(Booking.id, Booking.resource_id, Booking.start_time, Booking.end_time)
+    )
+    removed = result.all()
+    await change_feed.publish(db, "cancelled", removed)
+    await db.commit()
+    for row in removed:
+        if availability_index.loaded:
+            availability_index.remove_booking(row)
+        # Freed slots: let the waitlist have them (off the request path)
+        waitlist_queue.enqueue(row.resource_id, row.start_time, row.end_time)
+    return len(removed)
+
+# --- EXPORT ---
+
+async def stream_export(
+    db: AsyncSession,
+    user_id: Optional[int] = None,
+    start_time=None,
+    end_time=None,
+    chunk_size: int = 1000
+):
+    """
+    Yield bookings in partitions of `chunk_size` rows from a server-side cursor,
+    ordered by (start_time, id). Only one partition is in memory at a time.
+    user_id=None exports everyone's bookings.
+    """
+    query = select(
+        Booking.id, Booking.user_id, Booking.resource_id, Booking.start_time,
+        Booking.end_time, Booking.status, Booking.created_at, Booking.series_id
+    ).order_by(Booking.start_time, Booking.id).execution_options(yield_per=chunk_size)
+    if user_id is not None:
+        query = query.where(Booking.user_id == user_id)
+    if start_time is not None:
+        query = query.where(Booking.start_time >= start_time)
+    if end_time is not None:
+        query = query.where(Booking.start_time < end_time)
+
+    result = await db.stream(query)
+    async for partition in result.partitions():
+        yield partition
+
+async def get_archived(
+    db: AsyncSession,
+    user_id: Optional[int] = None,
+    start_time=None,
+    end_time=None,
+    limit: int = 100,
+    after: Optional[Tuple] = None
+):
+    """
+    Archived bookings (months moved to archive.bookings), ordered by
+    (start_time, id), optionally only one user's and those starting in
+    [start_time, end_time). Bounds on start_time prune archive partitions too.
+    """
+    query = select(archived_bookings).order_by(archived_bookings.c.start_time, archived_bookings.c.id)
+    if user_id is not None:
+        query = query.where(archived_bookings.c.user_id == user_id)
+    if start_time is not None:
+        query = query.where(archived_bookings.c.start_time >= start_time)
+    if end_time is not None:
+        query = query.where(archived_bookings.c.start_time < end_time)
+    if after:
+        query = query.where(tuple_(archived_bookings.c.start_time, archived_bookings.c.id) > tuple_(*after))
+    result = await db.execute(query.limit(limit))
+    return result.all()
+
+    # Deleting the Booking
+
+async def delete_booking(db: AsyncSession, booking_id: int, user_id: Optional[int] = None):
+    """
+    Delete a booking in one DELETE ... RETURNING; with `user_id`, only if
+    that user owns it. Returns the deleted booking, or None if nothing matched.
+    """
+    query = delete(Booking).where(Booking.id == booking_id)
+    if user_id is not None:
+        query = query.where(Booking.user_id == user_id)
+    result = await db.execute(query.returning(Booking).execution_options(synchronize_session=False))
     booking = result.scalar_one_or_none()
-    
-    if booking:
-        await db.delete(booking)
-        await db.commit()
+
+    if booking is None:
+        await db.rollback()
+        return None
+    await change_feed.publish(db, "cancelled", [booking])
+    await db.commit()
+    if availability_index.loaded:
+        availability_index.remove_booking(booking)
+    # Freed slot: let the waitlist have it (off the request path)
+    waitlist_queue.enqueue(booking.resource_id, booking.start_time, booking.end_time)
     return booking
 
-async def get_by_user(db: AsyncSession, user_id: int, skip: int = 0, limit: int = 100):
+async def get_by_user(
+    db: AsyncSession,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[Tuple] = None,
+    columns: Optional[list] = None
+):
     """
-    Get bookings for a specific user only.
+    Get bookings for a specific user only, ordered by (start_time, id).
+    With `columns`, plain rows of just those columns instead of ORM objects.
     """
-    query = select(Booking).where(Booking.user_id == user_id).offset(skip).limit(limit)
-    result = await db.execute(query)
-    return result.scalars().all()
\ No newline at end of file
+    query = (select(*columns) if columns else select(Booking)).where(
+        Booking.user_id == user_id
+    ).order_by(Booking.start_time, Booking.id)
+    if after:
+        query = query.where(tuple_(Booking.start_time, Booking.id) > tuple_(*after))
+    else:
+        query = query.offset(skip)
+    result = await db.execute(query.limit(limit))
+    return result.all() if columns else result.scalars().all()
\ No newline at end of file
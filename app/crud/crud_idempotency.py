@@ -0,0 +1,61 @@
+from datetime import timedelta
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import delete, update, func
+from sqlalchemy.dialects.postgresql import insert
+from app.models.idempotency_key import IdempotencyKey
+
+async def claim(db: AsyncSession, user_id: int, key: str, fingerprint: bytes, lock_seconds: float) -> bool:
+    """
+    Try to become the one request that executes under this key.
+    One statement: insert the key, or take over a row whose lock (or stored
+    response) has expired. The primary key makes concurrent duplicates wait
+    for each other and all but one of them get False.
+    """
+    expires_at = func.now() + timedelta(seconds=lock_seconds)
+    stmt = insert(IdempotencyKey).values(
+        user_id=user_id, key=key, fingerprint=fingerprint, expires_at=expires_at
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[IdempotencyKey.user_id, IdempotencyKey.key],
+        set_={
+            "fingerprint": stmt.excluded.fingerprint,
+            "status_code": None,
+            "response": None,
+            "expires_at": stmt.excluded.expires_at,
+            "created_at": func.now(),
+        },
+        where=IdempotencyKey.expires_at < func.now(),
+    ).returning(IdempotencyKey.user_id)
+    result = await db.execute(stmt)
+    return result.first() is not None
+
+async def get(db: AsyncSession, user_id: int, key: str) -> Optional[IdempotencyKey]:
+    result = await db.execute(
+        select(IdempotencyKey).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+    )
+    return result.scalar_one_or_none()
+
+async def complete(db: AsyncSession, user_id: int, key: str, status_code: int, response: bytes, ttl_seconds: float):
+    """
+    Store the finished response; replays are served from it until it expires.
+    """
+    await db.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+        .values(status_code=status_code, response=response, expires_at=func.now() + timedelta(seconds=ttl_seconds))
+    )
+
+async def release(db: AsyncSession, user_id: int, key: str):
+    """
+    Give the key back after a failed request, so a retry executes again.
+    """
+    await db.execute(
+        delete(IdempotencyKey).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+    )
+
+async def purge_expired(db: AsyncSession) -> int:
+    result = await db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < func.now()))
+    await db.commit()
+    return result.rowcount
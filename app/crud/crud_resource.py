@@ -2,53 +2,76 @@ from typing import List, Optional
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, func, extract, insert, Integer
+from app.core.availability import availability_index
+from app.core.catalog_cache import catalog_cache
 from app.models.resource import Resource
-from app.models.booking import Booking  # <--- Critical Import
+from app.models.booking import Booking, occupies_slot, overlapping  # <--- Critical Import
 from app.schemas.resource import ResourceCreate
 
-async def get_multi(db: AsyncSession, skip: int = 0, limit: int = 100):
-    result = await db.execute(select(Resource).offset(skip).limit(limit))
-    return result.scalars().all()
+async def get_multi(
+    db: AsyncSession, skip: int = 0, limit: int = 100, after_id: Optional[int] = None, columns: Optional[list] = None
+):
+    """
+    Resources ordered by id. `after_id` is the keyset cursor, `skip` the deprecated fallback.
+    With `columns`, plain rows of just those columns instead of ORM objects.
+    """
+    query = (select(*columns) if columns else select(Resource)).order_by(Resource.id)
+    if after_id is not None:
+        query = query.where(Resource.id > after_id)
+    else:
+        query = query.offset(skip)
+    result = await db.execute(query.limit(limit))
+    return result.all() if columns else result.scalars().all()
 
 async def create_resource(db: AsyncSession, obj_in: ResourceCreate):
-    db_obj = Resource(
-        name=obj_in.name,
-        type=obj_in.type,
-        location=obj_in.location,
-        capacity=obj_in.capacity,
-        is_active=True
+    # INSERT ... RETURNING: the new row comes back with the INSERT, no refresh
+    result = await db.execute(
+        insert(Resource).values(
+            name=obj_in.name,
+            type=obj_in.type,
+            location=obj_in.location,
+            capacity=obj_in.capacity,
+            is_active=True
+        ).returning(Resource)
     )
-    db.add(db_obj)
+    db_obj = result.scalar_one()
     await db.commit()
-    await db.refresh(db_obj)
+    # Any catalog write must bump the version so cached pages and ETags go stale
+    catalog_cache.bump()
+    if availability_index.loaded:
+        availability_index.add_resource(db_obj)
     return db_obj
 
 async def get_available(
     db: AsyncSession, 
     start_time: datetime, 
     end_time: datetime, 
-    min_capacity: int
+    min_capacity: int,
+    columns: Optional[list] = None
 ):
     """
     Finds resources that are NOT booked during the requested time slot.
+    Served from the in-memory availability index when it is loaded
+    (ResourceResponse models then, whatever `columns` says).
+    With `columns`, plain rows of just those columns instead of ORM objects.
     """
+    if availability_index.loaded:
+        return availability_index.available(start_time, end_time, min_capacity)
+
     # 1. FIND BUSY RESOURCES
-    # Select IDs of resources that have a confirmed booking overlapping our time
+    # Select IDs of resources that have a confirmed booking (or live hold) overlapping our time
     # Overlap Logic: (ExistingStart < RequestedEnd) AND (ExistingEnd > RequestedStart)
     busy_subquery = select(Booking.resource_id).where(
         and_(
-            Booking.status == "confirmed",
-            and_(
-                Booking.start_time < end_time,
-                Booking.end_time > start_time
-            )
+            occupies_slot(),
+            overlapping(start_time, end_time)
         )
     )
 
     # 2. FIND FREE RESOURCES
     # Select Resources whose ID is NOT in the busy list
-    query = select(Resource).where(
+    query = (select(*columns) if columns else select(Resource)).where(
         and_(
             Resource.id.not_in(busy_subquery),
             Resource.capacity >= min_capacity,
@@ -57,4 +80,84 @@ async def get_available(
     )
     
     result = await db.execute(query)
-    return result.scalars().all()
\ No newline at end of file
+    return result.all() if columns else result.scalars().all()
+
+async def get_busy_slot_rows(
+    db: AsyncSession,
+    start_time: datetime,
+    end_time: datetime,
+    slot_seconds: int,
+    slots: int,
+    min_capacity: int = 1,
+    type: Optional[str] = None
+):
+    """
+    One row per (matching resource, confirmed booking or live hold overlapping the window)
+    as (resource_id, name, first_slot, end_slot), plus a row with NULL slots
+    for resources with no booking at all. A single LEFT JOIN range query; the
+    slot arithmetic runs in Postgres so Python only ORs integers together.
+    """
+    first_slot = func.greatest(
+        func.floor(extract("epoch", Booking.start_time - start_time) / slot_seconds), 0
+    ).cast(Integer)
+    end_slot = func.least(
+        func.ceil(extract("epoch", Booking.end_time - start_time) / slot_seconds), slots
+    ).cast(Integer)
+
+    query = select(Resource.id, Resource.name, first_slot, end_slot).outerjoin(
+        Booking,
+        and_(
+            Booking.resource_id == Resource.id,
+            occupies_slot(),
+            overlapping(start_time, end_time)
+        )
+    ).where(
+        and_(
+            Resource.capacity >= min_capacity,
+            Resource.is_active == True
+        )
+    )
+    if type:
+        query = query.where(Resource.type == type)
+    result = await db.execute(query)
+    return result.all()
+
+
+async def lock_free_resource(
+    db: AsyncSession,
+    start_time: datetime,
+    end_time: datetime,
+    min_capacity: int = 1,
+    type: Optional[str] = None,
+    location: Optional[str] = None
+) -> Optional[Resource]:
+    """
+    Pick and row-lock the best free resource for a slot: the smallest one that
+    is big enough. FOR NO KEY UPDATE SKIP LOCKED makes concurrent callers step
+    over rooms someone else is booking right now instead of queueing behind
+    them, so a burst of requests fans out across rooms. It does not conflict
+    with the FOR KEY SHARE lock the bookings.resource_id foreign key check
+    takes, so plain POST /bookings/ for the room is not blocked meanwhile.
+    The lock lasts until the caller's transaction ends.
+    """
+    busy = select(Booking.id).where(
+        and_(
+            Booking.resource_id == Resource.id,
+            occupies_slot(),
+            overlapping(start_time, end_time)
+        )
+    )
+    query = select(Resource).where(
+        and_(
+            ~busy.exists(),
+            Resource.capacity >= min_capacity,
+            Resource.is_active == True
+        )
+    )
+    if type:
+        query = query.where(Resource.type == type)
+    if location:
+        query = query.where(Resource.location == location)
+    query = query.order_by(Resource.capacity, Resource.id).limit(1).with_for_update(skip_locked=True, key_share=True, of=Resource)
+    result = await db.execute(query)
+    return result.scalar_one_or_none()
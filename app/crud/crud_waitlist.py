@@ -0,0 +1,132 @@
+from bisect import bisect_left
+from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import func, literal, insert, update
+from sqlalchemy.exc import DBAPIError
+from app.core import change_feed
+from app.core.availability import availability_index, ensure_aware
+from app.core.waitlist_queue import waitlist_queue
+from app.crud.crud_booking import get_resource_intervals, is_overlap_violation
+from app.models.booking import Booking
+from app.models.waitlist_entry import WaitlistEntry
+from app.schemas.waitlist import WaitlistCreate
+
+async def create_entry(db: AsyncSession, obj_in: WaitlistCreate, user_id: int, priority: int = 0):
+    db_obj = WaitlistEntry(
+        user_id=user_id,
+        resource_id=obj_in.resource_id,
+        start_time=obj_in.start_time,
+        end_time=obj_in.end_time,
+        priority=priority,
+        status="waiting"
+    )
+    db.add(db_obj)
+    await db.commit()
+    await db.refresh(db_obj)
+    # The slot may have freed up already: let the worker check right away
+    waitlist_queue.enqueue(db_obj.resource_id, db_obj.start_time, db_obj.end_time)
+    return db_obj
+
+async def get_by_user(db: AsyncSession, user_id: int, limit: int = 100):
+    query = select(WaitlistEntry).where(WaitlistEntry.user_id == user_id).order_by(WaitlistEntry.id.desc())
+    result = await db.execute(query.limit(limit))
+    return result.scalars().all()
+
+async def cancel_entry(db: AsyncSession, entry_id: int, user_id: int):
+    """
+    Leave the waitlist. Only the owner's still-waiting entry matches.
+    """
+    result = await db.execute(
+        update(WaitlistEntry)
+        .where(WaitlistEntry.id == entry_id, WaitlistEntry.user_id == user_id, WaitlistEntry.status == "waiting")
+        .values(status="cancelled")
+        .returning(WaitlistEntry)
+    )
+    entry = result.scalar_one_or_none()
+    await db.commit()
+    return entry
+
+async def promote(db: AsyncSession, resource_id: int, start_time, end_time, limit: int = 100) -> Optional[List[Booking]]:
+    """
+    Book the best waiting entries whose slot now fits, around a freed
+    [start_time, end_time) on one resource. Everything in one transaction:
+    lock the candidates, read what is still occupied, pick greedily by
+    (priority desc, arrival), insert the bookings, mark the entries promoted.
+    Returns the new bookings, or None if a concurrent booking won the race.
+    """
+    # 1. Candidates, best first. SKIP LOCKED: entries another worker is promoting are theirs.
+    result = await db.execute(
+        select(WaitlistEntry)
+        .where(
+            WaitlistEntry.resource_id == resource_id,
+            # Inlined so the planner can use the partial ix_waitlist_entries_waiting
+            WaitlistEntry.status == literal("waiting", literal_execute=True),
+            WaitlistEntry.start_time < end_time,
+            WaitlistEntry.end_time > start_time,
+            # Slots already in the past are no use to anyone
+            WaitlistEntry.start_time > func.now()
+        )
+        .order_by(WaitlistEntry.priority.desc(), WaitlistEntry.created_at, WaitlistEntry.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    candidates = result.scalars().all()
+    if not candidates:
+        await db.rollback()
+        return []
+
+    # 2. One read of what is still occupied around them
+    taken = await get_resource_intervals(
+        db, resource_id,
+        min(c.start_time for c in candidates),
+        max(c.end_time for c in candidates)
+    )
+
+    # 3. Greedy: an entry wins if it overlaps nothing occupied and no better entry already picked
+    winners = []
+    for entry in candidates:
+        start, end = ensure_aware(entry.start_time), ensure_aware(entry.end_time)
+        pos = bisect_left(taken, (start, end))
+        before = taken[pos - 1] if pos > 0 else None
+        after = taken[pos] if pos < len(taken) else None
+        if (before and before[1] > start) or (after and after[0] < end):
+            continue
+        taken.insert(pos, (start, end))
+        winners.append(entry)
+    if not winners:
+        await db.rollback()
+        return []
+
+    # 4. Book them and link the entries, then commit once
+    try:
+        result = await db.scalars(
+            insert(Booking).returning(Booking, sort_by_parameter_order=True),
+            [
+                {
+                    "user_id": e.user_id,
+                    "resource_id": e.resource_id,
+                    "start_time": e.start_time,
+                    "end_time": e.end_time,
+                    "status": "confirmed",
+                }
+                for e in winners
+            ],
+        )
+        created = result.all()
+        await db.execute(
+            update(WaitlistEntry),
+            [{"id": e.id, "status": "promoted", "booking_id": b.id} for e, b in zip(winners, created)],
+        )
+        await change_feed.publish(db, "created", created)
+        await db.commit()
+    except DBAPIError as exc:
+        await db.rollback()
+        if is_overlap_violation(exc):
+            return None
+        raise
+
+    if availability_index.loaded:
+        for booking in created:
+            availability_index.add_booking(booking)
+    return created
@@ -1,4 +1,7 @@
 from app.db.base_class import Base
 from app.models.user import User
 from app.models.resource import Resource
-from app.models.booking import Booking
\ No newline at end of file
+from app.models.booking import Booking
+from app.models.booking_series import BookingSeries
+from app.models.idempotency_key import IdempotencyKey
+from app.models.waitlist_entry import WaitlistEntry
@@ -0,0 +1,368 @@
+"""
+Monthly range partitions of `bookings` on start_time (UTC).
+
+Partition bookings_pYYYY_MM holds the bookings starting in that month and
+carries its own copy of the overlap exclusion constraint: Postgres cannot
+enforce a GiST exclusion across partitions. A booking may run up to
+MAX_SPILL past the end of its month (each partition CHECKs that), e.g. an
+evening booking on the 31st in a timezone behind UTC. Overlaps across a
+month boundary can only involve such a booking, and the boundary guard
+trigger (BOUNDARY_GUARD_DDL) rejects them: per resource and boundary, it
+serializes the writers on an advisory lock and checks the neighbouring
+partition. Longer spills are refused by the API (see slot_problem()).
+
+Old months can be detached into the `archive` schema, where they stay
+queryable through archive.bookings (GET /bookings/archive), and later
+exported to gzipped CSV files and dropped.
+
+    python -m app.db.partitions list
+    python -m app.db.partitions ensure [--ahead 24]
+    python -m app.db.partitions archive --before 2025-01
+    python -m app.db.partitions export --before 2024-01 --dir /backups [--keep]
+
+`ensure` also runs at startup and every BOOKINGS_PARTITION_MAINTENANCE_INTERVAL_SECONDS.
+"""
+import argparse
+import asyncio
+import gzip
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from app.core.config import settings
+
+PARENT = "bookings"
+ARCHIVE_SCHEMA = "archive"
+
+_NAME = re.compile(r"^bookings_p(\d{4})_(\d{2})$")
+
+# Serializes maintenance runs (several workers start at once)
+_LOCK_KEY = 0x626F6F6B  # "book"
+
+# How far past the end of the month it starts in a booking may run. Baked
+# into every partition's bounds CHECK and the boundary guard: only ever raise it.
+MAX_SPILL = timedelta(days=7)
+
+
+# --- 1. BOUNDS ---
+
+def _utc(value: datetime) -> datetime:
+    # Naive values count as UTC
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def month_start(value: datetime) -> datetime:
+    """
+    First instant of the UTC month `value` falls in.
+    """
+    return _utc(value).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    index = value.year * 12 + value.month - 1 + months
+    return value.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_bounds(value: datetime) -> Tuple[datetime, datetime]:
+    """
+    [lo, hi) of the partition a booking starting at `value` goes to.
+    """
+    lo = month_start(value)
+    return lo, add_months(lo, 1)
+
+
+def partition_floor(value: datetime) -> datetime:
+    """
+    Earliest start of a booking still running at `value`. No booking runs
+    more than MAX_SPILL past its partition's upper bound, so adding
+    `start_time >= partition_floor(t)` to an overlap query changes nothing
+    but lets Postgres skip older partitions (all but one or two).
+    """
+    return month_start(_utc(value) - MAX_SPILL)
+
+
+def partition_name(lo: datetime) -> str:
+    return f"{PARENT}_p{lo:%Y_%m}"
+
+
+def parse_partition_name(name: str) -> Optional[datetime]:
+    match = _NAME.match(name)
+    if not match:
+        return None
+    return datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)
+
+
+def booking_horizon(now: Optional[datetime] = None) -> datetime:
+    """
+    Bookings must start before this. ensure_partitions() creates one month
+    beyond it, so a late maintenance run never leaves a bookable month without
+    its partition.
+    """
+    return add_months(month_start(now or datetime.now(timezone.utc)), settings.BOOKINGS_PARTITIONS_AHEAD + 1)
+
+
+def slot_problem(start_time: datetime, end_time: datetime) -> Optional[str]:
+    """
+    Why a booking for [start_time, end_time) cannot be stored, or None.
+    """
+    # Naive request times count as UTC, like everywhere else
+    start_time, end_time = _utc(start_time), _utc(end_time)
+    _, hi = partition_bounds(start_time)
+    if end_time > hi + MAX_SPILL:
+        return (
+            f"Bookings can run at most {MAX_SPILL.days} days past the end of the month (UTC) "
+            f"they start in, split it at {(hi + MAX_SPILL).isoformat()}"
+        )
+    if start_time >= booking_horizon():
+        return f"Bookings can be made at most {settings.BOOKINGS_PARTITIONS_AHEAD} months ahead"
+    return None
+
+
+# --- 2. DDL ---
+
+def partition_ddl(lo: datetime) -> str:
+    """
+    CREATE TABLE for one month: the partition, its bounds CHECK and its share
+    of the overlap exclusion (same predicate as occupies_slot()).
+    Indexes and the boundary guard trigger come from the parent.
+    """
+    hi = add_months(lo, 1)
+    name = partition_name(lo)
+    return (
+        f"CREATE TABLE {name} PARTITION OF {PARENT} ("
+        f"CONSTRAINT {name}_within_bounds CHECK (end_time <= '{(hi + MAX_SPILL).isoformat()}'), "
+        f"CONSTRAINT {name}_no_overlap EXCLUDE USING gist "
+        f"(resource_id WITH =, tstzrange(start_time, end_time) WITH &&) "
+        f"WHERE (status IN ('confirmed', 'held'))"
+        f") FOR VALUES FROM ('{lo.isoformat()}') TO ('{hi.isoformat()}')"
+    )
+
+
+# Overlaps across a month boundary, which no partition's exclusion constraint
+# sees. Both sides of one (a booking running past month M, a booking starting
+# in M + 1 early enough to meet it) lock (resource_id, month index of the
+# boundary) and then look at the other partition, so neither can miss the
+# other. Locks are taken in boundary order. Raised as an exclusion violation,
+# which the app already turns into a 409.
+BOUNDARY_GUARD_DDL = (
+    f"""
+    CREATE OR REPLACE FUNCTION bookings_boundary_guard() RETURNS trigger
+    LANGUAGE plpgsql
+    -- Month arithmetic on timestamptz follows the session's zone: pin it
+    SET TimeZone = 'UTC'
+    AS $$
+    DECLARE
+        lo timestamptz := date_trunc('month', NEW.start_time AT TIME ZONE 'UTC') AT TIME ZONE 'UTC';
+        hi timestamptz := lo + interval '1 month';
+        lo_key integer := (extract(year FROM lo AT TIME ZONE 'UTC') * 12 + extract(month FROM lo AT TIME ZONE 'UTC'))::integer;
+    BEGIN
+        IF NEW.status NOT IN ('confirmed', 'held') THEN
+            RETURN NEW;
+        END IF;
+        IF NEW.start_time < lo + interval '{MAX_SPILL.days} days' THEN
+            PERFORM pg_advisory_xact_lock(NEW.resource_id, lo_key);
+            IF EXISTS (
+                SELECT 1 FROM {PARENT} b
+                WHERE b.resource_id = NEW.resource_id
+                  AND b.status IN ('confirmed', 'held')
+                  AND b.start_time >= lo - interval '1 month' AND b.start_time < lo
+                  AND b.end_time > NEW.start_time
+            ) THEN
+                RAISE EXCEPTION 'conflicting key value violates exclusion constraint "bookings_boundary_no_overlap"'
+                    USING ERRCODE = 'exclusion_violation', CONSTRAINT = 'bookings_boundary_no_overlap';
+            END IF;
+        END IF;
+        IF NEW.end_time > hi THEN
+            PERFORM pg_advisory_xact_lock(NEW.resource_id, lo_key + 1);
+            IF EXISTS (
+                SELECT 1 FROM {PARENT} b
+                WHERE b.resource_id = NEW.resource_id
+                  AND b.status IN ('confirmed', 'held')
+                  AND b.start_time >= hi AND b.start_time < NEW.end_time
+            ) THEN
+                RAISE EXCEPTION 'conflicting key value violates exclusion constraint "bookings_boundary_no_overlap"'
+                    USING ERRCODE = 'exclusion_violation', CONSTRAINT = 'bookings_boundary_no_overlap';
+            END IF;
+        END IF;
+        RETURN NEW;
+    END $$
+    """,
+    f"""
+    CREATE OR REPLACE TRIGGER bookings_boundary_guard
+    BEFORE INSERT OR UPDATE OF resource_id, start_time, end_time, status ON {PARENT}
+    FOR EACH ROW EXECUTE FUNCTION bookings_boundary_guard()
+    """,
+)
+
+
+async def create_boundary_guard(conn: AsyncConnection):
+    """
+    Install BOUNDARY_GUARD_DDL (the migrations do it too; this is for
+    schemas built with create_all, e.g. the benchmarks').
+    """
+    for statement in BOUNDARY_GUARD_DDL:
+        await conn.exec_driver_sql(statement)
+
+
+async def list_partitions(conn: AsyncConnection, schema: str = "public") -> List[str]:
+    """
+    Month partitions attached to bookings in `schema`, oldest first.
+    """
+    result = await conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "JOIN pg_namespace n ON n.oid = p.relnamespace "
+            "WHERE p.relname = :parent AND n.nspname = :schema"
+        ),
+        {"parent": PARENT, "schema": schema},
+    )
+    names = [name for name in result.scalars() if parse_partition_name(name)]
+    return sorted(names, key=parse_partition_name)
+
+
+async def _lock(conn: AsyncConnection):
+    await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _LOCK_KEY})
+
+
+# --- 3. MAINTENANCE ---
+
+async def ensure_partitions(
+    conn: AsyncConnection, ahead: Optional[int] = None, since: Optional[datetime] = None
+) -> List[str]:
+    """
+    Create the missing monthly partitions from `since` (default: this month)
+    through the month after the last bookable one (`ahead` bookable months,
+    default BOOKINGS_PARTITIONS_AHEAD). Months that were already archived are
+    not recreated. Returns the names created.
+    """
+    now = datetime.now(timezone.utc)
+    first = month_start(since or now)
+    last = booking_horizon(now) if ahead is None else add_months(month_start(now), ahead + 1)
+
+    await _lock(conn)
+    existing = set(await list_partitions(conn)) | set(await list_partitions(conn, ARCHIVE_SCHEMA))
+    created = []
+    lo = first
+    while lo <= last:
+        if partition_name(lo) not in existing:
+            await conn.exec_driver_sql(partition_ddl(lo))
+            created.append(partition_name(lo))
+        lo = add_months(lo, 1)
+    return created
+
+
+async def archive_partitions(conn: AsyncConnection, before: datetime) -> List[str]:
+    """
+    Detach the partitions of months ending by `before` and attach them to
+    archive.bookings. They leave every query on `bookings` (and the
+    availability checks) but stay readable from the archive. A month's
+    bookings can run MAX_SPILL into the next one, so last month only goes
+    once that is over: `before` may not be later than partition_floor(now).
+    """
+    before = month_start(before)
+    latest = partition_floor(datetime.now(timezone.utc))
+    if before > latest:
+        raise ValueError(
+            f"Only months whose bookings are over can be archived (they may run {MAX_SPILL.days} days "
+            f"into the next month): use --before {latest:%Y-%m} or earlier"
+        )
+
+    await _lock(conn)
+    archived = []
+    for name in await list_partitions(conn):
+        lo = parse_partition_name(name)
+        hi = add_months(lo, 1)
+        if hi > before:
+            break
+        await conn.exec_driver_sql(f"ALTER TABLE {PARENT} DETACH PARTITION {name}")
+        await conn.exec_driver_sql(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}")
+        await conn.exec_driver_sql(
+            f"ALTER TABLE {ARCHIVE_SCHEMA}.{PARENT} ATTACH PARTITION {ARCHIVE_SCHEMA}.{name} "
+            f"FOR VALUES FROM ('{lo.isoformat()}') TO ('{hi.isoformat()}')"
+        )
+        archived.append(name)
+    return archived
+
+
+async def export_partitions(conn: AsyncConnection, before: datetime, directory: str, drop: bool = True) -> List[str]:
+    """
+    Write each archived partition of a month ending by `before` to
+    <directory>/<partition>.csv.gz (with a header row), then drop it unless
+    `drop` is False. A file is complete once it has its final name.
+    Returns the files written.
+    """
+    before = month_start(before)
+    os.makedirs(directory, exist_ok=True)
+    raw = (await conn.get_raw_connection()).driver_connection
+
+    await _lock(conn)
+    written = []
+    for name in await list_partitions(conn, ARCHIVE_SCHEMA):
+        if add_months(parse_partition_name(name), 1) > before:
+            break
+        path = os.path.join(directory, f"{name}.csv.gz")
+        with gzip.open(path + ".part", "wb") as fh:
+            await raw.copy_from_table(name, schema_name=ARCHIVE_SCHEMA, output=fh, format="csv", header=True)
+        os.replace(path + ".part", path)
+        if drop:
+            await conn.exec_driver_sql(f"DROP TABLE {ARCHIVE_SCHEMA}.{name}")
+        written.append(path)
+    return written
+
+
+# --- 4. COMMAND LINE ---
+
+def _month(value: str) -> datetime:
+    return datetime.strptime(value, "%Y-%m").replace(tzinfo=timezone.utc)
+
+
+async def _main(args):
+    from app.db.session import engine
+    try:
+        async with engine.begin() as conn:
+            if args.command == "list":
+                for schema in ("public", ARCHIVE_SCHEMA):
+                    for name in await list_partitions(conn, schema):
+                        print(f"{schema}.{name}")
+                return
+            if args.command == "ensure":
+                done = await ensure_partitions(conn, ahead=args.ahead, since=args.since)
+            elif args.command == "archive":
+                done = await archive_partitions(conn, args.before)
+            else:
+                done = await export_partitions(conn, args.before, args.dir, drop=not args.keep)
+        print(f"{args.command}: {len(done)}")
+        for item in done:
+            print(f"  {item}")
+    finally:
+        await engine.dispose()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="show the partitions, live and archived")
+    ensure = commands.add_parser("ensure", help="create upcoming partitions")
+    ensure.add_argument("--ahead", type=int, help="bookable months ahead to cover (default BOOKINGS_PARTITIONS_AHEAD)")
+    ensure.add_argument("--since", type=_month, help="also create missing months from YYYY-MM on")
+    archive = commands.add_parser("archive", help="move months before YYYY-MM to the archive schema")
+    archive.add_argument(
+        "--before", type=_month, required=True,
+        help=f"YYYY-MM, at most this month and only after its first {MAX_SPILL.days} days: "
+        "until then last month's bookings may still be running",
+    )
+    export = commands.add_parser("export", help="write archived months before YYYY-MM to .csv.gz, then drop them")
+    export.add_argument("--before", type=_month, required=True)
+    export.add_argument("--dir", required=True)
+    export.add_argument("--keep", action="store_true", help="do not drop the exported partitions")
+    asyncio.run(_main(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
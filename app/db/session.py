@@ -1,11 +1,76 @@
+import asyncio
+import time
+from typing import Optional
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.core.config import settings
+from app.core.metrics import instrument_engine
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 
 
+#pool statistics (checkout waits are not tracked by SQLAlchemy itself)
+
+class PoolWaitStats:
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record(self, waited: float, timed_out: bool = False):
+        if timed_out:
+            self.timeouts += 1
+        else:
+            self.checkouts += 1
+        self.wait_seconds_total += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+
+pool_wait_stats = PoolWaitStats()
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    The default async pool, plus timing of how long each checkout waited
+    for a free connection (including opening a new one).
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            entry = super()._do_get()
+        except PoolTimeoutError:
+            pool_wait_stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        pool_wait_stats.record(time.perf_counter() - started)
+        return entry
+
+
 #this is the engine
 
-engine = create_async_engine(settings.ASYNC_DATABASE_URL, echo = True, future = True)
+def _engine_options() -> dict:
+    return dict(
+        echo=settings.DB_ECHO,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        # asyncpg prepared statement cache (set to 0 behind pgbouncer in transaction mode)
+        connect_args={"prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE},
+    )
+
+engine = create_async_engine(settings.ASYNC_DATABASE_URL, poolclass=InstrumentedQueuePool, **_engine_options())
+
+# statement counts and DB time per request (served at /metrics)
+instrument_engine(engine.sync_engine)
+
+# optional read replica, same pool settings
+replica_engine = None
+if settings.ASYNC_REPLICA_DATABASE_URL:
+    replica_engine = create_async_engine(settings.ASYNC_REPLICA_DATABASE_URL, **_engine_options())
+    instrument_engine(replica_engine.sync_engine)
 
 #session making
 
@@ -16,10 +81,151 @@ AsyncSessionLocal = sessionmaker(
     autoflush = False,
 )
 
+AsyncReadSessionLocal = sessionmaker(
+    bind = replica_engine,
+    class_ = AsyncSession,
+    expire_on_commit = False,
+    autoflush = False,
+) if replica_engine is not None else None
+
+
+#read routing
+
+class ReplicaRouter:
+    """
+    Decides per request whether a read may go to the replica:
+    - no replica configured, or it is unreachable / lagging -> primary
+    - the user wrote something in the last READ_YOUR_WRITES_SECONDS -> primary
+    Writes are tracked per process, so pin users to a worker (or keep the
+    window generous) when running several.
+    """
+
+    def __init__(self):
+        self._recent_writes: dict = {}
+        self.healthy = False
+        self.lag_seconds = None
+        self._checked_at = 0.0
+        self._checking = False
+        # Background health check in flight (kept so it is not garbage collected)
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.replica_reads = 0
+        self.primary_reads = 0
+
+    def note_write(self, user_id: int):
+        now = time.monotonic()
+        self._recent_writes[user_id] = now + settings.READ_YOUR_WRITES_SECONDS
+        # Keep the map from growing without bound
+        if len(self._recent_writes) > 10000:
+            self._recent_writes = {u: t for u, t in self._recent_writes.items() if t > now}
+
+    def wrote_recently(self, user_id) -> bool:
+        deadline = self._recent_writes.get(user_id)
+        return deadline is not None and deadline > time.monotonic()
+
+    async def _replay_lag(self):
+        async with replica_engine.connect() as conn:
+            result = await conn.exec_driver_sql(
+                "SELECT EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())"
+            )
+            return result.scalar()
+
+    async def refresh_health(self):
+        """
+        Replay lag as the replica sees it. NULL means it is not a standby
+        (or has replayed nothing yet); either way, don't trust it. A replica
+        that does not answer within REPLICA_HEALTH_CHECK_TIMEOUT_SECONDS
+        (e.g. a blackholed host) counts as unhealthy too.
+        """
+        if self._checking:
+            return
+        self._checking = True
+        try:
+            lag = await asyncio.wait_for(self._replay_lag(), settings.REPLICA_HEALTH_CHECK_TIMEOUT_SECONDS)
+            self.lag_seconds = float(lag) if lag is not None else None
+            self.healthy = lag is not None and float(lag) <= settings.REPLICA_MAX_LAG_SECONDS
+        except Exception:
+            self.healthy = False
+            self.lag_seconds = None
+        finally:
+            self._checked_at = time.monotonic()
+            self._checking = False
+
+    async def session_factory(self, user_id=None):
+        if AsyncReadSessionLocal is None:
+            self.primary_reads += 1
+            return AsyncSessionLocal
+        # Stale health is refreshed off the request path: this request goes by
+        # the last known state (primary until the first check has answered)
+        stale = time.monotonic() - self._checked_at > settings.REPLICA_HEALTH_CHECK_SECONDS
+        if stale and (self._refresh_task is None or self._refresh_task.done()):
+            self._refresh_task = asyncio.create_task(self.refresh_health(), name="replica_health")
+        if not self.healthy or (user_id is not None and self.wrote_recently(user_id)):
+            self.primary_reads += 1
+            return AsyncSessionLocal
+        self.replica_reads += 1
+        return AsyncReadSessionLocal
+
+    def stats(self) -> dict:
+        return {
+            "configured": replica_engine is not None,
+            "healthy": self.healthy,
+            "lag_seconds": self.lag_seconds,
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+        }
+
+
+replica_router = ReplicaRouter()
+
 #injecting dependency 
 async def get_db():
     async with AsyncSessionLocal() as session:
         try:
             yield session
         finally:
-            await session.close()
\ No newline at end of file
+            await session.close()
+
+
+#pool helpers
+
+async def warm_up_pool(connections: int):
+    """
+    Open `connections` connections up front so the first requests
+    don't pay for the TCP + auth handshake.
+    """
+    connections = min(connections, settings.DB_POOL_SIZE)
+    opened = []
+    try:
+        for _ in range(connections):
+            conn = await engine.connect()
+            opened.append(conn)
+            await conn.exec_driver_sql("SELECT 1")
+    finally:
+        # Back into the pool, still open
+        for conn in opened:
+            await conn.close()
+    return len(opened)
+
+
+async def dispose_engines():
+    await engine.dispose()
+    if replica_engine is not None:
+        await replica_engine.dispose()
+
+
+def get_pool_status() -> dict:
+    pool = engine.pool
+    waits = pool_wait_stats
+    attempts = waits.checkouts + waits.timeouts
+    return {
+        "pool_size": pool.size(),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        # Negative while the pool is still below pool_size
+        "overflow": pool.overflow(),
+        "checkouts": waits.checkouts,
+        "timeouts": waits.timeouts,
+        "avg_wait_seconds": round(waits.wait_seconds_total / attempts, 6) if attempts else 0.0,
+        "max_wait_seconds": round(waits.max_wait_seconds, 6),
+    }
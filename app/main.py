@@ -1,17 +1,112 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from app.core.config import settings
-from app.api.v1.endpoints import users, login, resources, bookings         # <- importing login, resources, user
-from app.models import user, resource, booking
+from app.core.compression import ETagAwareGZipMiddleware
+from app.core.availability import availability_index
+from app.core.security import password_hasher
+from app.core.principal_cache import principal_cache
+from app.core.catalog_cache import catalog_cache
+from app.core.change_feed import change_feed
+from app.core.periodic import start_periodic, stop_periodic
+from app.core.waitlist_queue import waitlist_queue
+from app.core.metrics import MetricsMiddleware, StatsGauges, registry
+from app.db import partitions
+from app.db.session import AsyncSessionLocal, engine, dispose_engines, warm_up_pool, get_pool_status, replica_router
+from app.api.v1.endpoints import users, login, resources, bookings, admin, waitlist        # <- importing login, resources, user
+from app.crud import crud_booking, crud_idempotency, crud_waitlist
+from app.models import user, resource, booking, booking_series, idempotency_key, waitlist_entry
 
 
-app = FastAPI(title=settings.PROJECT_NAME, openapi_url=f"{settings.API_V1_STR}/openapi.json")
+async def purge_idempotency_keys():
+    async with AsyncSessionLocal() as db:
+        await crud_idempotency.purge_expired(db)
+
+
+async def create_booking_partitions():
+    async with engine.begin() as conn:
+        await partitions.ensure_partitions(conn)
+
+
+async def sweep_expired_holds():
+    async with AsyncSessionLocal() as db:
+        await crud_booking.sweep_expired_holds(db, batch_size=settings.HOLD_SWEEP_BATCH_SIZE)
+
+
+async def promote_waitlist(resource_id, start_time, end_time) -> int:
+    async with AsyncSessionLocal() as db:
+        # None: lost a race against a plain booking, look again once
+        for _ in range(2):
+            created = await crud_waitlist.promote(
+                db, resource_id, start_time, end_time, limit=settings.WAITLIST_PROMOTION_BATCH
+            )
+            if created is not None:
+                for booking in created:
+                    replica_router.note_write(booking.user_id)
+                return len(created)
+    return 0
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open pool connections before serving traffic
+    if settings.DB_POOL_WARMUP > 0:
+        await warm_up_pool(settings.DB_POOL_WARMUP)
+    # Bookable months need their partitions (idempotent, serialized across workers)
+    await create_booking_partitions()
+    # Warm the in-memory availability index before serving traffic
+    if settings.AVAILABILITY_INDEX_ENABLED:
+        async with AsyncSessionLocal() as db:
+            await availability_index.load(db)
+    # Housekeeping on the event loop
+    tasks = [
+        start_periodic("purge_idempotency_keys", settings.IDEMPOTENCY_PURGE_INTERVAL_SECONDS, purge_idempotency_keys),
+        start_periodic("sweep_expired_holds", settings.HOLD_SWEEP_INTERVAL_SECONDS, sweep_expired_holds),
+        start_periodic(
+            "create_booking_partitions", settings.BOOKINGS_PARTITION_MAINTENANCE_INTERVAL_SECONDS, create_booking_partitions
+        ),
+    ]
+    waitlist_queue.start(promote_waitlist)
+    yield
+    await waitlist_queue.stop()
+    await stop_periodic(*tasks)
+    await change_feed.stop()
+    password_hasher.shutdown()
+    await dispose_engines()
+
+
+app = FastAPI(title=settings.PROJECT_NAME, openapi_url=f"{settings.API_V1_STR}/openapi.json", lifespan=lifespan)
+
+# Added first, so it runs inside the metrics middleware (which times the compression too).
+# Starlette leaves text/event-stream alone, so /bookings/stream is not buffered.
+# ETags are kept apart per encoding (see app/core/compression.py)
+if settings.GZIP_ENABLED:
+    app.add_middleware(ETagAwareGZipMiddleware, minimum_size=settings.GZIP_MINIMUM_SIZE, compresslevel=settings.GZIP_COMPRESS_LEVEL)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+registry.register(StatsGauges("db_pool", "Database connection pool.", get_pool_status))
+registry.register(StatsGauges("principal_cache", "Authenticated-principal cache.", principal_cache.stats))
+registry.register(StatsGauges("password_hash_pool", "bcrypt worker pool.", password_hasher.stats))
+registry.register(StatsGauges("db_replica", "Read replica routing.", replica_router.stats))
+registry.register(StatsGauges("catalog_cache", "Resource catalog cache.", catalog_cache.stats))
+registry.register(StatsGauges("change_feed", "Booking change feed.", change_feed.stats))
+registry.register(StatsGauges("waitlist_queue", "Waitlist promotion worker.", waitlist_queue.stats))
 
 app.include_router(users.router, prefix="/api/v1/users", tags=["users"])
 app.include_router(login.router, prefix="/api/v1", tags=["login"])
 app.include_router(resources.router, prefix="/api/v1/resources", tags=["resources"])
 app.include_router(bookings.router, prefix="/api/v1/bookings", tags=["bookings"])
+app.include_router(waitlist.router, prefix="/api/v1/waitlist", tags=["waitlist"])
+app.include_router(admin.router, prefix="/api/v1/admin", tags=["admin"])
 
 
 @app.get("/")
 def read_root():
-    return {"status":"Dark Passanger has awake ~_~"}
\ No newline at end of file
+    return {"status":"Dark Passanger has awake ~_~"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
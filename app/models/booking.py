@@ -1,25 +1,118 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, String
+from sqlalchemy import (
+    Column, Integer, ForeignKey, DateTime, String, Index, MetaData, PrimaryKeyConstraint, Table,
+    and_, or_, literal,
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base_class import Base
+from app.db.partitions import ARCHIVE_SCHEMA, partition_floor
+
+# Suffix of the exclusion constraints that reject overlapping confirmed bookings (and holds),
+# one per partition (bookings_p2026_10_no_overlap, ...), plus the boundary guard's
+# (bookings_boundary_no_overlap). crud_booking looks for it to turn the DB error into a 409.
+BOOKING_OVERLAP_CONSTRAINT = "_no_overlap"
+
+# Status lifecycle: "held" -> "confirmed", or "held" -> "expired" (by the hold sweeper)
 
 class Booking(Base):
     __tablename__ = "bookings"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     
     # Foreign Keys
     user_id = Column(Integer, ForeignKey("user.id"), nullable=False)
     resource_id = Column(Integer, ForeignKey("resources.id"), nullable=False)
+    # Set for occurrences of a recurring booking; cancelling the series deletes by it
+    series_id = Column(Integer, ForeignKey("booking_series.id", ondelete="CASCADE"), nullable=True, index=True)
     
     # Time
-    start_time = Column(DateTime(timezone=True), nullable=False)
+    start_time = Column(DateTime(timezone=True), primary_key=True)
     end_time = Column(DateTime(timezone=True), nullable=False)
     
     # Status
     status = Column(String, default="confirmed")
+    # Holds only: when the hold lapses unless confirmed (NULL otherwise)
+    expires_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
     user = relationship("User", back_populates="bookings")
-    resource = relationship("Resource", back_populates="bookings")
\ No newline at end of file
+    resource = relationship("Resource", back_populates="bookings")
+
+    # Range-partitioned by month on start_time, see app/db/partitions.py. The
+    # primary key has to include the partition key; ids still come from one
+    # sequence, so the ORM identity is the id alone.
+    # Conflict detection lives in Postgres: each partition carries a GiST
+    # exclusion on (resource, period), which is O(log n) and race-free, and the
+    # boundary guard trigger covers bookings running into the next month, so
+    # together they cover the table. Needs btree_gist. Holds are covered too; a lapsed hold keeps its slot until
+    # it is marked expired (see crud_booking.expire_holds), so every reader
+    # filters with occupies_slot().
+    __mapper_args__ = {"primary_key": [id]}
+    __table_args__ = (
+        PrimaryKeyConstraint(id, start_time),
+        # Keyset pagination: ORDER BY (start_time, id), all and per user
+        Index("ix_bookings_start_time_id", start_time, id),
+        Index("ix_bookings_user_id_start_time_id", user_id, start_time, id),
+        # Hold sweeper: next holds to lapse, and nothing else
+        Index("ix_bookings_held_expires_at", expires_at, postgresql_where=(status == "held")),
+        # Overlap reads (occupies_slot() AND start < :end AND end > :start) only need
+        # rows ending after :start, i.e. not the ever-growing past. Both are
+        # covering, so these reads are index-only scans.
+        # Per resource: lock_free_resource, find_conflicts, get_resource_intervals, the grid, waitlist promotion
+        Index(
+            "ix_bookings_occupied_resource_end", resource_id, end_time,
+            postgresql_include=["start_time", "status", "expires_at"],
+            postgresql_where=status.in_(["confirmed", "held"]),
+        ),
+        # Across resources: get_available
+        Index(
+            "ix_bookings_occupied_end", end_time,
+            postgresql_include=["start_time", "resource_id", "status", "expires_at"],
+            postgresql_where=status.in_(["confirmed", "held"]),
+        ),
+        {"postgresql_partition_by": "RANGE (start_time)"},
+    )
+
+
+def occupies_slot():
+    """
+    SQL predicate for bookings that currently block their slot:
+    confirmed ones, and holds that have not lapsed yet.
+    The statuses are inlined rather than bound: only constants let the planner
+    match the partial indexes above, in generic (prepared) plans too.
+    """
+    return or_(
+        Booking.status == literal("confirmed", literal_execute=True),
+        and_(Booking.status == literal("held", literal_execute=True), Booking.expires_at > func.now()),
+    )
+
+
+def overlapping(start_time, end_time):
+    """
+    SQL predicate for bookings overlapping [start_time, end_time).
+    The lower bound on start_time is implied by the partition bounds CHECKs, but
+    only a predicate on the partition key lets Postgres skip the older partitions.
+    """
+    return and_(
+        Booking.start_time < end_time,
+        Booking.end_time > start_time,
+        Booking.start_time >= partition_floor(start_time),
+    )
+
+
+# Months moved out by app/db/partitions.py (archive_partitions). Its own
+# MetaData: the table is created by the migrations, never by create_all.
+archived_bookings = Table(
+    "bookings",
+    MetaData(schema=ARCHIVE_SCHEMA),
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, nullable=False),
+    Column("resource_id", Integer, nullable=False),
+    Column("series_id", Integer),
+    Column("start_time", DateTime(timezone=True), primary_key=True),
+    Column("end_time", DateTime(timezone=True), nullable=False),
+    Column("status", String),
+    Column("expires_at", DateTime(timezone=True)),
+    Column("created_at", DateTime(timezone=True)),
+)
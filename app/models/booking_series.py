@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, String
+from sqlalchemy.sql import func
+from app.db.base_class import Base
+
+class BookingSeries(Base):
+    __tablename__ = "booking_series"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # Foreign Keys
+    user_id = Column(Integer, ForeignKey("user.id"), nullable=False)
+    resource_id = Column(Integer, ForeignKey("resources.id"), nullable=False)
+
+    # The rule the occurrences were expanded from, e.g. "FREQ=WEEKLY;INTERVAL=1;COUNT=52"
+    rrule = Column(String, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, String, LargeBinary
+from sqlalchemy.sql import func
+from app.db.base_class import Base
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    # Keys are scoped per user: two clients may pick the same key
+    user_id = Column(Integer, ForeignKey("user.id", ondelete="CASCADE"), primary_key=True)
+    key = Column(String(255), primary_key=True)
+
+    # sha256 of the request (method, path, body), to catch a key reused for a different request
+    fingerprint = Column(LargeBinary, nullable=False)
+
+    # NULL while the first request is still running
+    status_code = Column(Integer, nullable=True)
+    response = Column(LargeBinary, nullable=True)
+
+    # While running: when a crashed request's claim may be taken over.
+    # Once finished: when the stored response stops being replayed.
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
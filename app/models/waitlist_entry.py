@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, String, Index
+from sqlalchemy.sql import func
+from app.db.base_class import Base
+
+class WaitlistEntry(Base):
+    __tablename__ = "waitlist_entries"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # Foreign Keys
+    user_id = Column(Integer, ForeignKey("user.id", ondelete="CASCADE"), nullable=False, index=True)
+    resource_id = Column(Integer, ForeignKey("resources.id"), nullable=False)
+    # The booking made for this entry once it was promoted. Not a foreign key:
+    # bookings is partitioned, so its ids are only unique together with start_time
+    booking_id = Column(Integer, nullable=True)
+
+    # The slot being waited for
+    start_time = Column(DateTime(timezone=True), nullable=False)
+    end_time = Column(DateTime(timezone=True), nullable=False)
+
+    # Higher goes first; ties by arrival
+    priority = Column(Integer, nullable=False, server_default="0")
+    # "waiting" -> "promoted" | "cancelled"
+    status = Column(String, nullable=False, server_default="waiting")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Promotion: waiting entries of one resource around a freed slot
+        Index("ix_waitlist_entries_waiting", resource_id, start_time, postgresql_where=(status == "waiting")),
+    )
@@ -1,5 +1,6 @@
-from datetime import datetime
-from pydantic import BaseModel, FutureDatetime
+from datetime import datetime, timezone
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field, FutureDatetime, model_validator
 
 # Base properties
 class BookingBase(BaseModel):
@@ -7,16 +8,89 @@ class BookingBase(BaseModel):
     start_time: FutureDatetime # Must be in the future
     end_time: FutureDatetime
 
+# RRULE-style repeat rule (subset of RFC 5545: FREQ, INTERVAL, COUNT, UNTIL, EXDATE)
+class RecurrenceRule(BaseModel):
+    freq: Literal["daily", "weekly", "monthly"]
+    interval: int = Field(default=1, ge=1)
+    count: Optional[int] = Field(default=None, ge=1)
+    until: Optional[datetime] = None
+    exdates: List[datetime] = []
+    # False: any conflicting occurrence fails the whole series (409)
+    # True: book the free occurrences and report the rest
+    skip_conflicts: bool = False
+
+    @model_validator(mode="after")
+    def check_end(self):
+        if self.count is None and self.until is None:
+            raise ValueError("Recurrence needs either count or until")
+        return self
+
+    def to_rrule(self) -> str:
+        parts = [f"FREQ={self.freq.upper()}", f"INTERVAL={self.interval}"]
+        if self.count:
+            parts.append(f"COUNT={self.count}")
+        if self.until:
+            until = self.until.astimezone(timezone.utc) if self.until.tzinfo else self.until
+            parts.append(f"UNTIL={until.strftime('%Y%m%dT%H%M%SZ')}")
+        return ";".join(parts)
+
 # Properties to receive on creation
 class BookingCreate(BookingBase):
-    pass
+    recurrence: Optional[RecurrenceRule] = None
+
+# Reserve a slot for a few minutes, then POST /bookings/{id}/confirm
+class BookingHoldCreate(BookingBase):
+    # Defaults to BOOKING_HOLD_SECONDS, capped at BOOKING_HOLD_MAX_SECONDS
+    hold_seconds: Optional[int] = Field(default=None, ge=1)
+
+# "Book any matching resource": a time window plus filters instead of a resource_id
+class AutoBookingCreate(BaseModel):
+    start_time: FutureDatetime
+    end_time: FutureDatetime
+    type: Optional[str] = None
+    location: Optional[str] = None
+    min_capacity: int = Field(default=1, ge=1)
 
 # Properties to return to client (includes ID and Status)
 class BookingResponse(BookingBase):
+    # Past bookings are listed too: no FutureDatetime check on the way out
+    start_time: datetime
+    end_time: datetime
     id: int
     user_id: int
     status: str
     created_at: datetime
+    series_id: Optional[int] = None
+    # Holds only
+    expires_at: Optional[datetime] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# --- BATCH BOOKING ---
+
+# One line of the batch report, in the same order as the request list
+class BookingBatchItem(BaseModel):
+    index: int
+    status: Literal["created", "conflict", "invalid"]
+    booking: Optional[BookingResponse] = None
+    detail: Optional[str] = None
+
+class BookingBatchResponse(BaseModel):
+    mode: Literal["atomic", "best_effort"]
+    created: int
+    failed: int
+    items: List[BookingBatchItem]
+
+# --- RECURRING BOOKING ---
+
+class BookingOccurrence(BaseModel):
+    start_time: datetime
+    end_time: datetime
+
+class BookingSeriesResponse(BaseModel):
+    series_id: Optional[int] = None
+    rrule: str
+    occurrences: int
+    created: List[BookingResponse]
+    conflicts: List[BookingOccurrence]
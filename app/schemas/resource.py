@@ -1,5 +1,6 @@
+from datetime import datetime
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Literal, Optional, Union
 
 # Base properties (shared)
 class ResourceBase(BaseModel):
@@ -18,4 +19,20 @@ class ResourceResponse(ResourceBase):
     is_active: bool
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# --- FREE/BUSY GRID ---
+
+class ResourceAvailabilityLine(BaseModel):
+    resource_id: int
+    name: str
+    # bitset: base64, LSB-first, 1 = busy. rle: alternating run lengths, free first.
+    busy: Union[str, List[int]]
+
+class AvailabilityGridResponse(BaseModel):
+    start: datetime
+    end: datetime
+    slot_seconds: int
+    slots: int
+    encoding: Literal["bitset", "rle"]
+    resources: List[ResourceAvailabilityLine]
@@ -0,0 +1,24 @@
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel, Field
+from app.schemas.booking import BookingBase
+
+# Properties to receive on creation
+class WaitlistCreate(BookingBase):
+    # Only honoured for superusers; everyone else waits at 0
+    priority: int = Field(default=0, ge=0, le=100)
+
+# Properties to return to client
+class WaitlistResponse(BaseModel):
+    id: int
+    user_id: int
+    resource_id: int
+    start_time: datetime
+    end_time: datetime
+    priority: int
+    status: str
+    booking_id: Optional[int] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,232 @@
+"""
+EXPLAIN-plan regression check for the hot CRUD queries.
+
+Seeds a large bookings table, runs the real crud functions, captures every
+statement they send, EXPLAINs each one (FORMAT JSON), and fails if any plan
+reads a big table with a sequential scan. Because it captures the SQL the
+code actually emits, a refactor that defeats an index fails here.
+
+    python -m benchmarks.explain_check --bookings 200000
+    python -m benchmarks.explain_check --generic     # also check generic (prepared) plans
+
+--generic matters: asyncpg prepares statements, and after a few executions
+Postgres may switch to a plan built without the parameter values. A partial
+index can only be used there if its predicate matches constants in the SQL.
+
+bookings is partitioned by month, so plans name its partitions
+(bookings_p2026_10, ...); those count as bookings. Empty or tiny partitions
+(under --min-pages, e.g. months nobody has booked yet) are cheapest to read
+sequentially and are not flagged.
+
+Exits 1 on any sequential scan of a table in --big-tables. Needs a
+dedicated Postgres database, see benchmarks/load_test.py. WARNING: drops
+and recreates all tables in it.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List
+
+from benchmarks.common import (
+    configure_database, reset_schema, seed_bookings, seed_resources, seed_users, write_results,
+)
+
+
+def walk(plan: dict) -> Iterator[dict]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from walk(child)
+
+
+def table_of(relation: str) -> str:
+    """
+    The partitioned table a partition belongs to, or the relation itself.
+    """
+    from app.db.partitions import PARENT, parse_partition_name
+    return PARENT if parse_partition_name(relation) else relation
+
+
+def seq_scans(plan: dict, tables, pages: Dict[str, int], min_pages: int) -> List[str]:
+    return [
+        node["Relation Name"] for node in walk(plan)
+        if node.get("Node Type") == "Seq Scan"
+        and table_of(node.get("Relation Name", "")) in tables
+        and pages.get(node["Relation Name"], 0) >= min_pages
+    ]
+
+
+def scan_summary(plan: dict) -> List[str]:
+    return [
+        f"{node['Node Type']}({node.get('Index Name') or node['Relation Name']})"
+        for node in walk(plan) if "Relation Name" in node
+    ]
+
+
+async def capture(engine, cases):
+    """
+    Run each (name, coroutine factory) and record the SELECT/UPDATE/DELETE
+    statements it executed, with their parameters.
+    """
+    from sqlalchemy import event
+    captured, current = [], {"case": None}
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        verb = statement.lstrip().split(None, 1)[0].upper()
+        if current["case"] and verb in ("SELECT", "UPDATE", "DELETE", "WITH") and not executemany:
+            captured.append((current["case"], statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    try:
+        for name, factory in cases:
+            current["case"] = name
+            await factory()
+    finally:
+        current["case"] = None
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
+    return captured
+
+
+def build_cases(user_ids, resource_ids):
+    from app.crud import crud_booking, crud_resource
+    from app.db.session import AsyncSessionLocal
+    from app.schemas.booking import AutoBookingCreate, BookingCreate
+
+    soon = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) + timedelta(days=3)
+    hour = timedelta(hours=1)
+
+    def with_session(fn):
+        async def run():
+            async with AsyncSessionLocal() as db:
+                await fn(db)
+        return run
+
+    return [
+        ("get_available", with_session(lambda db: crud_resource.get_available(db, soon, soon + hour, 1))),
+        ("lock_free_resource", with_session(lambda db: crud_resource.lock_free_resource(db, soon, soon + hour))),
+        ("get_busy_slot_rows", with_session(lambda db: crud_resource.get_busy_slot_rows(db, soon, soon + 7 * 24 * hour, 900, 672))),
+        ("get_resource_intervals", with_session(lambda db: crud_booking.get_resource_intervals(db, resource_ids[0], soon, soon + 30 * 24 * hour))),
+        ("find_conflicts", with_session(lambda db: crud_booking.find_conflicts(
+            db, [(i, BookingCreate(resource_id=r, start_time=soon, end_time=soon + hour)) for i, r in enumerate(resource_ids[:20])]
+        ))),
+        ("get_by_user", with_session(lambda db: crud_booking.get_by_user(db, user_ids[0], limit=100))),
+        ("get_by_user_cursor", with_session(lambda db: crud_booking.get_by_user(db, user_ids[0], limit=100, after=(soon, 0)))),
+        ("get_multi_cursor", with_session(lambda db: crud_booking.get_multi(db, limit=100, after=(soon, 0)))),
+        ("expire_holds_sweep", with_session(lambda db: crud_booking.expire_holds(db, limit=1000))),
+        ("expire_holds_slot", with_session(lambda db: crud_booking.expire_holds(db, resource_ids[0], soon, soon + hour))),
+        ("auto_book", with_session(lambda db: crud_booking.auto_book(
+            db, AutoBookingCreate(start_time=soon + 1000 * hour, end_time=soon + 1001 * hour), user_ids[0]
+        ))),
+    ]
+
+
+def sql_literal(value) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, (list, tuple)):
+        return f"ARRAY[{', '.join(sql_literal(v) for v in value)}]"
+    text = value.isoformat() if hasattr(value, "isoformat") else str(value)
+    return "'" + text.replace("'", "''") + "'"
+
+
+async def explain(engine, statement, parameters, generic: bool) -> dict:
+    async with engine.connect() as conn:
+        if generic:
+            # EXPLAIN (GENERIC_PLAN) is no use here: asyncpg sends everything
+            # through the extended protocol, where the server then wants values
+            # for the $n. A PREPAREd statement under force_generic_plan gets the
+            # same plan the app's prepared statements may switch to.
+            await conn.exec_driver_sql("SET LOCAL plan_cache_mode = force_generic_plan")
+            await conn.exec_driver_sql("PREPARE explain_check AS " + statement)
+            try:
+                # EXECUTE takes no bind parameters. The values still matter: partitions
+                # are pruned from the generic plan when it starts, as they would be at run time
+                args = f"({', '.join(sql_literal(value) for value in parameters)})" if parameters else ""
+                result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) EXECUTE explain_check{args}")
+                raw = result.scalar()
+            finally:
+                # Prepared statements outlive the transaction
+                await conn.exec_driver_sql("DEALLOCATE explain_check")
+        else:
+            result = await conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, tuple(parameters))
+            raw = result.scalar()
+        await conn.rollback()
+    return (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+
+
+async def relation_pages(engine) -> Dict[str, int]:
+    async with engine.connect() as conn:
+        result = await conn.exec_driver_sql(
+            "SELECT relname, relpages FROM pg_class WHERE relkind = 'r' AND relnamespace = 'public'::regnamespace"
+        )
+        return dict(result.all())
+
+
+async def run(args) -> dict:
+    from app.db.session import engine
+
+    await reset_schema(engine)
+    user_ids = await seed_users(engine, 200)
+    resource_ids = await seed_resources(engine, args.resources)
+    await seed_bookings(engine, args.bookings, resource_ids, user_ids)
+
+    captured = await capture(engine, build_cases(user_ids, resource_ids))
+    pages = await relation_pages(engine)
+
+    checks, failures = [], []
+    modes = [False, True] if args.generic else [False]
+    for case, statement, parameters in captured:
+        for generic in modes:
+            plan = await explain(engine, statement, parameters, generic)
+            bad = seq_scans(plan, args.big_tables, pages, args.min_pages)
+            entry = {
+                "case": case,
+                "plan": "generic" if generic else "custom",
+                "scans": scan_summary(plan),
+                "total_cost": plan.get("Total Cost"),
+                "ok": not bad,
+            }
+            checks.append(entry)
+            if bad:
+                failures.append({**entry, "statement": " ".join(statement.split())})
+    await engine.dispose()
+    return {
+        "params": {
+            "bookings": args.bookings, "resources": args.resources, "generic": args.generic, "min_pages": args.min_pages,
+        },
+        "checks": checks,
+        "failures": failures,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="defaults to $BENCH_DATABASE_URL or a local booking_bench database")
+    parser.add_argument("--bookings", type=int, default=200_000)
+    parser.add_argument("--resources", type=int, default=200)
+    parser.add_argument("--big-tables", type=lambda s: set(s.split(",")), default={"bookings"},
+                        help="tables that must never be sequentially scanned")
+    parser.add_argument("--min-pages", type=int, default=10,
+                        help="sequential scans of smaller relations (e.g. empty partitions) are fine")
+    parser.add_argument("--generic", action="store_true", help="also EXPLAIN the generic plan")
+    parser.add_argument("--output", help="write the JSON report here as well")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_database(args.database_url)
+    report = asyncio.run(run(args))
+    write_results(args.output, report)
+    if report["failures"]:
+        print(f"FAILED: {len(report['failures'])} plan(s) fall back to a sequential scan", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
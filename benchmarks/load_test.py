@@ -0,0 +1,177 @@
+"""
+Concurrency load test and double-booking check for the booking hot path.
+
+Runs the app in-process (httpx over ASGI, lifespan included) against a real
+Postgres. The overlap guarantee lives in a Postgres exclusion constraint, so
+SQLite or mocks would prove nothing. `docker compose up db` plus
+`createdb -h localhost -U postgres booking_bench` is enough locally.
+
+    python -m benchmarks.load_test --requests 5000 --concurrency 200 \
+        --mix book=0.6,search=0.3,login=0.1 --resources 5 --slots 40 \
+        --output results/load.json
+
+Contention is set by --resources x --slots: every booking request picks one
+of those slots (1 or 2 hours long, so neighbours overlap too). Fewer slots
+means more requests racing for the same one.
+
+At the end it checks, straight in the database, that no two confirmed
+bookings overlap and that every 200 from POST /bookings/ is a row in the
+table. Exits 1 if either fails. WARNING: drops and recreates all tables in
+the target database.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.common import (
+    BENCH_PASSWORD, configure_database, count_overlaps, percentiles,
+    reset_schema, seed_resources, seed_users, write_results,
+)
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("book", "search", "login"):
+            raise argparse.ArgumentTypeError(f"unknown request kind {name!r}")
+        mix[name] = float(weight)
+    return mix
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="defaults to $BENCH_DATABASE_URL or a local booking_bench database")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("book=0.6,search=0.3,login=0.1"))
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--resources", type=int, default=5, help="resources booking requests compete for")
+    parser.add_argument("--slots", type=int, default=40, help="hourly slots per resource booking requests compete for")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here as well")
+    return parser.parse_args(argv)
+
+
+def build_plan(args, user_ids, resource_ids, tokens):
+    """
+    The full request list, generated up front so the run measures the server only.
+    """
+    rng = random.Random(args.seed)
+    base = (datetime.now(timezone.utc) + timedelta(days=7)).replace(minute=0, second=0, microsecond=0)
+    kinds, weights = zip(*args.mix.items())
+    plan = []
+    for _ in range(args.requests):
+        kind = rng.choices(kinds, weights)[0]
+        user_index = rng.randrange(len(user_ids))
+        if kind == "book":
+            start = base + timedelta(hours=rng.randrange(args.slots))
+            end = start + timedelta(hours=rng.choice((1, 1, 1, 2)))
+            plan.append(("book", tokens[user_index], {
+                "resource_id": rng.choice(resource_ids),
+                "start_time": start.isoformat(),
+                "end_time": end.isoformat(),
+            }))
+        elif kind == "search":
+            start = base + timedelta(hours=rng.randrange(args.slots))
+            plan.append(("search", tokens[user_index], {
+                "start_time": start.isoformat(),
+                "end_time": (start + timedelta(hours=1)).isoformat(),
+            }))
+        else:
+            plan.append(("login", None, {
+                "username": f"bench-user-{user_index + 1}@example.com",
+                "password": BENCH_PASSWORD,
+            }))
+    return plan
+
+
+async def run(args):
+    import httpx
+    from app.main import app
+    from app.db.session import engine
+    from app.core.security import create_access_token
+
+    # 1. Fresh schema and data
+    await reset_schema(engine)
+    user_ids = await seed_users(engine, args.users)
+    resource_ids = await seed_resources(engine, args.resources)
+    tokens = [create_access_token(uid) for uid in user_ids]
+    plan = build_plan(args, user_ids, resource_ids, tokens)
+
+    latencies = defaultdict(list)
+    statuses = defaultdict(Counter)
+    booked = []
+    gate = asyncio.Semaphore(args.concurrency)
+
+    async def send(client, kind, token, payload):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        async with gate:
+            started = time.perf_counter()
+            if kind == "book":
+                response = await client.post("/api/v1/bookings/", json=payload, headers=headers)
+            elif kind == "search":
+                response = await client.get("/api/v1/resources/search", params=payload, headers=headers)
+            else:
+                response = await client.post("/api/v1/login/access-token", data=payload)
+            latencies[kind].append(time.perf_counter() - started)
+        statuses[kind][response.status_code] += 1
+        if kind == "book" and response.status_code == 200:
+            booked.append(response.json()["id"])
+
+    # 2. The run itself, app lifespan included (pool warm-up, background workers)
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(send(client, *item) for item in plan))
+            wall = time.perf_counter() - started
+
+    # 3. Correctness, checked in the database itself
+    overlaps = await count_overlaps(engine)
+    async with engine.connect() as conn:
+        confirmed = (await conn.exec_driver_sql("SELECT count(*) FROM bookings WHERE status = 'confirmed'")).scalar()
+    await engine.dispose()
+
+    report = {
+        "params": {
+            "requests": args.requests, "concurrency": args.concurrency, "mix": args.mix,
+            "users": args.users, "resources": args.resources, "slots": args.slots, "seed": args.seed,
+        },
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(args.requests / wall, 1),
+        "kinds": {
+            kind: {
+                "count": len(samples),
+                "status": dict(statuses[kind]),
+                "rps": round(len(samples) / wall, 1),
+                "latency_ms": percentiles(samples),
+            }
+            for kind, samples in latencies.items()
+        },
+        "correctness": {
+            "overlapping_confirmed_pairs": overlaps,
+            "bookings_acknowledged": len(booked),
+            "bookings_confirmed_in_db": confirmed,
+            "ok": overlaps == 0 and confirmed == len(booked),
+        },
+    }
+    return report
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_database(args.database_url)
+    report = asyncio.run(run(args))
+    write_results(args.output, report)
+    if not report["correctness"]["ok"]:
+        print("FAILED: double booking or lost/phantom writes detected", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
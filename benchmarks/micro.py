@@ -0,0 +1,326 @@
+"""
+Micro-benchmarks: what each layer of the hot path costs on its own.
+
+Every `bench_*` coroutine below is one benchmark. It seeds what it needs and
+yields (case, op) pairs; the runner times `op` (sync or async) repeatedly
+and reports the median and p95 per call.
+
+    python -m benchmarks.micro                              # everything
+    python -m benchmarks.micro --no-db                      # JWT + serialization only
+    python -m benchmarks.micro -k list_response             # response_model vs FAST_JSON_RESPONSES
+    python -m benchmarks.micro -k get_available --sizes 10000,100000,1000000
+    python -m benchmarks.micro --output base.json           # save a baseline
+    python -m benchmarks.micro --baseline base.json --tolerance 0.2
+
+With --baseline, exits 1 if any case's median is more than `tolerance`
+slower than in the baseline. Database benchmarks need a dedicated Postgres
+database, see benchmarks/load_test.py. WARNING: they drop and recreate all
+tables in it.
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from benchmarks.common import (
+    configure_database, reset_schema, seed_bookings, seed_resources, seed_users, write_results,
+)
+
+
+# --- 1. DATA GENERATORS (no database) ---
+
+def fake_bookings(count: int, seed: int = 1):
+    """
+    ORM-shaped bookings: skewed resource popularity, 30-120 minute slots in
+    the future, a few per recurring series.
+    """
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    rows = []
+    for i in range(count):
+        start = now + timedelta(days=1 + rng.randrange(90), hours=rng.randrange(8, 18))
+        rows.append(SimpleNamespace(
+            id=i + 1,
+            user_id=1 + int(rng.paretovariate(1.2)) % 500,
+            resource_id=1 + int(rng.random() ** 3 * 50),
+            start_time=start,
+            end_time=start + timedelta(minutes=rng.choice((30, 60, 60, 60, 90, 120))),
+            status="confirmed",
+            created_at=now - timedelta(days=rng.randrange(30)),
+            series_id=rng.randrange(1, 100) if rng.random() < 0.1 else None,
+            expires_at=None,
+        ))
+    return rows
+
+
+# --- 2. BENCHMARKS ---
+
+async def bench_jwt(ctx):
+    from app.api import deps
+    from app.core.security import create_access_token
+    token = create_access_token(42)
+    yield "encode", lambda: create_access_token(42)
+    yield "decode", lambda: deps.get_token_user_id(token)
+
+
+async def bench_booking_response_serialization(ctx):
+    from typing import List
+    from pydantic import TypeAdapter
+    from app.schemas.booking import BookingResponse
+    adapter = TypeAdapter(List[BookingResponse])
+    for size in (100, 1000):
+        rows = fake_bookings(size)
+        yield f"validate+dump_json[{size}]", lambda rows=rows: adapter.dump_json(
+            adapter.validate_python(rows, from_attributes=True)
+        )
+
+
+async def bench_list_response(ctx):
+    """
+    CPU to turn one page of bookings into response bytes: FastAPI's
+    response_model path (validate ORM objects, encode, json.dumps) against
+    the FAST_JSON_RESPONSES path (plain rows, one TypeAdapter dump), the
+    ?fields= path for the 4 columns the Streamlit page shows, and gzipping
+    the full page at GZIP_COMPRESS_LEVEL.
+    """
+    import gzip
+    from collections import namedtuple
+    from typing import List
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_model_field
+    from app.core.config import settings
+    from app.core.fast_json import RowSerializer
+    from app.schemas.booking import BookingResponse
+    field = create_model_field(name="response", type_=List[BookingResponse], mode="serialization")
+    serializer = RowSerializer(BookingResponse)
+    sparse = serializer.pick("resource_id,start_time,end_time,status")
+    Row = namedtuple("Row", serializer.fields)
+    SparseRow = namedtuple("SparseRow", sparse.fields)
+    for size in (100, 1000):
+        objects = fake_bookings(size)
+        rows = [Row(*(getattr(o, name) for name in serializer.fields)) for o in objects]
+
+        async def response_model(objects=objects):
+            content = await serialize_response(field=field, response_content=objects, is_coroutine=True)
+            return JSONResponse(content).body
+
+        yield f"response_model[{size}]", response_model
+        yield f"row_serializer[{size}]", lambda rows=rows: serializer.dump_json(rows)
+        sparse_rows = [SparseRow(*(getattr(o, name) for name in sparse.fields)) for o in objects]
+        yield f"sparse_fields[{size}]", lambda rows=sparse_rows: sparse.dump_json(rows)
+        body = serializer.dump_json(rows)
+        yield f"gzip[{size}]", lambda body=body: gzip.compress(body, settings.GZIP_COMPRESS_LEVEL)
+
+
+async def bench_get_current_user(ctx):
+    from app.api import deps
+    from app.core.principal_cache import principal_cache
+    from app.db.session import AsyncSessionLocal
+    user_id = ctx.user_ids[0]
+
+    async def lookup():
+        async with AsyncSessionLocal() as db:
+            await deps.get_current_user(db=db, user_id=user_id)
+
+    async def lookup_cold():
+        principal_cache.clear()
+        await lookup()
+
+    yield "cache_hit", lookup
+    yield "cache_miss", lookup_cold
+    principal_cache.clear()
+
+
+async def bench_create_booking(ctx):
+    from app.crud import crud_booking
+    from app.db.session import AsyncSessionLocal
+    from app.db.partitions import add_months, month_start
+    from app.schemas.booking import BookingCreate
+    # Every call books a new, never-conflicting hour a year out (inside the partitioned horizon)
+    base = add_months(month_start(datetime.now(timezone.utc)), 12)
+    counter = iter(range(10**9))
+    resource_id, user_id = ctx.resource_ids[-1], ctx.user_ids[0]
+
+    async def create():
+        start = base + timedelta(hours=next(counter))
+        obj_in = BookingCreate(resource_id=resource_id, start_time=start, end_time=start + timedelta(hours=1))
+        async with AsyncSessionLocal() as db:
+            await crud_booking.create_booking(db=db, obj_in=obj_in, user_id=user_id)
+
+    async def conflict():
+        start = base - timedelta(hours=1)
+        obj_in = BookingCreate(resource_id=resource_id, start_time=start, end_time=start + timedelta(hours=1))
+        async with AsyncSessionLocal() as db:
+            await crud_booking.create_booking(db=db, obj_in=obj_in, user_id=user_id)
+
+    await conflict()  # the first one books the slot, later ones hit the constraint
+    yield "insert", create
+    yield "conflict_409", conflict
+
+
+async def bench_read_bookings_page(ctx):
+    """
+    One 1000-row page of GET /bookings/ minus HTTP: ORM objects + response_model
+    against plain column rows + RowSerializer. DB time included.
+    """
+    from typing import List
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_model_field
+    from app.core.fast_json import RowSerializer
+    from app.crud import crud_booking
+    from app.db.session import AsyncSessionLocal, engine
+    from app.models.booking import Booking
+    from app.schemas.booking import BookingResponse
+    field = create_model_field(name="response", type_=List[BookingResponse], mode="serialization")
+    serializer = RowSerializer(BookingResponse)
+    await seed_bookings(engine, 20_000, ctx.resource_ids, ctx.user_ids)
+
+    async def orm():
+        async with AsyncSessionLocal() as db:
+            bookings = await crud_booking.get_multi(db, limit=1000)
+            content = await serialize_response(field=field, response_content=bookings, is_coroutine=True)
+            return JSONResponse(content).body
+
+    async def rows():
+        async with AsyncSessionLocal() as db:
+            page = await crud_booking.get_multi(db, limit=1000, columns=serializer.columns(Booking))
+            return serializer.dump_json(page)
+
+    yield "orm+response_model[1000]", orm
+    yield "rows+row_serializer[1000]", rows
+
+
+async def bench_get_available(ctx):
+    from app.crud import crud_resource
+    from app.db.session import AsyncSessionLocal, engine
+    rng = random.Random(7)
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+    async def search():
+        start = now + timedelta(days=rng.randrange(60), hours=rng.randrange(8, 18))
+        async with AsyncSessionLocal() as db:
+            await crud_resource.get_available(db, start, start + timedelta(hours=1), min_capacity=1)
+
+    for size in ctx.sizes:
+        # Table size is the point here, so reseed per size
+        await reset_schema(engine)
+        ctx.user_ids = await seed_users(engine, 100)
+        ctx.resource_ids = await seed_resources(engine, 50)
+        await seed_bookings(engine, size, ctx.resource_ids, ctx.user_ids)
+        yield f"bookings={size}", search
+
+
+DB_BENCHES = {"get_current_user", "create_booking", "read_bookings_page", "get_available"}
+
+
+# --- 3. RUNNER ---
+
+async def measure(op, min_time: float, warmup: int = 3) -> dict:
+    is_async = inspect.iscoroutinefunction(op)
+    for _ in range(warmup):
+        await op() if is_async else op()
+    samples = []
+    deadline = time.perf_counter() + min_time
+    while time.perf_counter() < deadline or len(samples) < 5:
+        started = time.perf_counter()
+        if is_async:
+            await op()
+        else:
+            op()
+        samples.append(time.perf_counter() - started)
+    ordered = sorted(samples)
+    return {
+        "runs": len(samples),
+        "median_us": round(statistics.median(ordered) * 1e6, 2),
+        "p95_us": round(ordered[int(len(ordered) * 0.95) - 1] * 1e6, 2),
+        "ops_per_sec": round(len(samples) / sum(samples), 1),
+    }
+
+
+async def run(args) -> dict:
+    ctx = SimpleNamespace(sizes=args.sizes, user_ids=[], resource_ids=[])
+    benches = {
+        name[len("bench_"):]: fn for name, fn in globals().items()
+        if name.startswith("bench_") and inspect.isasyncgenfunction(fn)
+    }
+    selected = [
+        name for name in benches
+        if (not args.k or args.k in name) and not (args.no_db and name in DB_BENCHES)
+    ]
+
+    engine = None
+    if any(name in DB_BENCHES for name in selected):
+        from app.db.session import engine
+        await reset_schema(engine)
+        ctx.user_ids = await seed_users(engine, 100)
+        ctx.resource_ids = await seed_resources(engine, 50)
+
+    results = {}
+    for name in selected:
+        async for case, op in benches[name](ctx):
+            key = f"{name}/{case}"
+            results[key] = await measure(op, args.min_time)
+            print(f"{key:55} {results[key]['median_us']:>12.2f} us", file=sys.stderr)
+    if engine is not None:
+        await engine.dispose()
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Cases whose median got slower than baseline * (1 + tolerance).
+    Cases missing from either side are ignored.
+    """
+    regressions = []
+    for key, now in results.items():
+        before = baseline.get(key)
+        if before and now["median_us"] > before["median_us"] * (1 + tolerance):
+            regressions.append({
+                "case": key,
+                "baseline_us": before["median_us"],
+                "median_us": now["median_us"],
+                "slowdown": round(now["median_us"] / before["median_us"] - 1, 3),
+            })
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="defaults to $BENCH_DATABASE_URL or a local booking_bench database")
+    parser.add_argument("-k", help="only benchmarks whose name contains this")
+    parser.add_argument("--no-db", action="store_true", help="skip benchmarks that need Postgres")
+    parser.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=[10_000, 100_000, 1_000_000],
+                        help="booking table sizes for get_available")
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds spent timing each case")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed median slowdown vs baseline (0.2 = 20%%)")
+    parser.add_argument("--output", help="write the JSON report here as well")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_database(args.database_url)
+    results = asyncio.run(run(args))
+
+    report = {"params": {"sizes": args.sizes, "min_time": args.min_time, "k": args.k}, "results": results}
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)["results"]
+        report["regressions"] = compare(results, baseline, args.tolerance)
+    write_results(args.output, report)
+    if report.get("regressions"):
+        print(f"FAILED: {len(report['regressions'])} case(s) slower than baseline +{args.tolerance:.0%}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
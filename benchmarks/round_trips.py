@@ -0,0 +1,194 @@
+"""
+Round trips per write request.
+
+Sends each write endpoint through the app in-process (httpx over ASGI,
+lifespan included) and counts what it sends to Postgres: SQL statements,
+plus transaction ends (COMMIT / ROLLBACK). Every statement is a network
+round trip, so this is the number to keep small; unlike latency it does
+not depend on the machine.
+
+    python -m benchmarks.round_trips
+    python -m benchmarks.round_trips --output trips.json
+
+Callers are authenticated once up front, so the principal cache is warm and
+the counts are the write paths' own. The app's connections use a non-UTC
+session time zone (SESSION_TIME_ZONE). Exits 1 if a case sends more statements
+than its budget (BUDGETS below) or answers with an unexpected status. Needs
+a dedicated Postgres database, see benchmarks/load_test.py. WARNING: drops
+and recreates all tables in it.
+"""
+import argparse
+import asyncio
+import sys
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.common import (
+    configure_database, reset_schema, seed_resources, seed_users, write_results,
+)
+
+# case -> (expected status, max statements). The notify statement of the
+# booking writes (change feed) is included.
+BUDGETS = {
+    # Existence check (before hashing), then the INSERT
+    "create_user": (200, 2),
+    "create_user_duplicate": (400, 1),
+    "create_resource": (200, 1),
+    "create_booking": (200, 2),
+    # Naive timestamps, as the Streamlit frontend sends them (read as UTC)
+    "create_booking_naive": (200, 2),
+    # Runs into the next month (the boundary guard's checks are in the INSERT)
+    "create_booking_across_months": (200, 2),
+    # Around the first of November (UTC) with the sessions in SESSION_TIME_ZONE, where
+    # October is one hour longer: the boundary guard must not do its month
+    # arithmetic in the session's zone
+    "create_booking_dst_next_month": (200, 2),
+    "create_booking_dst_crossing_conflict": (409, 2),
+    "create_hold": (200, 2),
+    "delete_booking_not_owner": (403, 2),
+    "delete_booking": (200, 2),
+}
+
+
+# The app's connections run in this zone, not UTC: nothing may depend on the
+# session TimeZone (Postgres does timestamptz arithmetic in it)
+SESSION_TIME_ZONE = "Europe/Berlin"
+
+
+class Counter:
+    """
+    Statements and transaction ends seen on an engine, reset per case.
+    """
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.statements = []
+        self.transactions = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._statement)
+        event.listen(engine.sync_engine, "commit", self._transaction)
+        event.listen(engine.sync_engine, "rollback", self._transaction)
+
+    def _statement(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(" ".join(statement.split())[:120])
+
+    def _transaction(self, conn):
+        self.transactions += 1
+
+    def reset(self):
+        self.statements = []
+        self.transactions = 0
+
+
+async def run(args) -> dict:
+    import httpx
+    from sqlalchemy import event
+    from app.main import app
+    from app.db.partitions import add_months, month_start
+    from app.db.session import engine
+    from app.core.security import create_access_token
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_time_zone(dbapi_connection, connection_record):
+        # On the asyncpg connection itself: outside a transaction, so it sticks
+        dbapi_connection.run_async(lambda conn: conn.execute(f"SET TIME ZONE '{SESSION_TIME_ZONE}'"))
+
+    await reset_schema(engine)
+    owner_id, other_id = await seed_users(engine, 2)
+    resource_id, = await seed_resources(engine, 1)
+    owner = {"Authorization": f"Bearer {create_access_token(owner_id)}"}
+    other = {"Authorization": f"Bearer {create_access_token(other_id)}"}
+    # Mid-morning early next month: never crosses a partition boundary
+    start = add_months(month_start(datetime.now(timezone.utc)), 1) + timedelta(days=2, hours=10)
+
+    counter = Counter(engine)
+    report, failures = {}, []
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for headers in (owner, other):
+                await client.get("/api/v1/bookings/", params={"limit": 1}, headers=headers)
+
+            async def case(name, method, url, headers=None, **kwargs):
+                counter.reset()
+                response = await client.request(method, url, headers=headers, **kwargs)
+                expected, budget = BUDGETS[name]
+                entry = {
+                    "status": response.status_code,
+                    "statements": len(counter.statements),
+                    "transactions": counter.transactions,
+                    "budget": budget,
+                    "sql": counter.statements,
+                }
+                entry["ok"] = response.status_code == expected and entry["statements"] <= budget
+                report[name] = entry
+                if not entry["ok"]:
+                    failures.append(name)
+                return response
+
+            user = {"email": "round-trips@example.com", "full_name": "Round Trips", "password": "secret-password"}
+            await case("create_user", "POST", "/api/v1/users/", json=user)
+            await case("create_user_duplicate", "POST", "/api/v1/users/", json=user)
+            await case("create_resource", "POST", "/api/v1/resources/", owner, json={
+                "name": "Round Trip Room", "type": "meeting_room", "location": "Floor 1", "capacity": 4,
+            })
+            booked = await case("create_booking", "POST", "/api/v1/bookings/", owner, json={
+                "resource_id": resource_id,
+                "start_time": start.isoformat(),
+                "end_time": (start + timedelta(hours=1)).isoformat(),
+            })
+            naive = start.replace(tzinfo=None) + timedelta(hours=4)
+            await case("create_booking_naive", "POST", "/api/v1/bookings/", owner, json={
+                "resource_id": resource_id,
+                "start_time": naive.isoformat(),
+                "end_time": (naive + timedelta(hours=1)).isoformat(),
+            })
+            boundary = add_months(month_start(start), 1)
+            await case("create_booking_across_months", "POST", "/api/v1/bookings/", owner, json={
+                "resource_id": resource_id,
+                "start_time": (boundary - timedelta(hours=2)).isoformat(),
+                "end_time": (boundary + timedelta(hours=2)).isoformat(),
+            })
+            now = datetime.now(timezone.utc)
+            november = datetime(now.year + (now.month >= 10), 11, 1, tzinfo=timezone.utc)
+            await case("create_booking_dst_next_month", "POST", "/api/v1/bookings/", owner, json={
+                "resource_id": resource_id,
+                "start_time": november.isoformat(),
+                "end_time": (november + timedelta(minutes=30)).isoformat(),
+            })
+            await case("create_booking_dst_crossing_conflict", "POST", "/api/v1/bookings/", owner, json={
+                "resource_id": resource_id,
+                "start_time": (november - timedelta(minutes=30)).isoformat(),
+                "end_time": (november + timedelta(minutes=45)).isoformat(),
+            })
+            await case("create_hold", "POST", "/api/v1/bookings/hold", owner, json={
+                "resource_id": resource_id,
+                "start_time": (start + timedelta(hours=2)).isoformat(),
+                "end_time": (start + timedelta(hours=3)).isoformat(),
+            })
+            booking_id = booked.json().get("id") if booked.status_code == 200 else 0
+            await case("delete_booking_not_owner", "DELETE", f"/api/v1/bookings/{booking_id}", other)
+            await case("delete_booking", "DELETE", f"/api/v1/bookings/{booking_id}", owner)
+
+    await engine.dispose()
+    return {"cases": report, "failures": failures}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="defaults to $BENCH_DATABASE_URL or a local booking_bench database")
+    parser.add_argument("--output", help="write the JSON report here as well")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_database(args.database_url)
+    report = asyncio.run(run(args))
+    write_results(args.output, report)
+    if report["failures"]:
+        print(f"FAILED: {', '.join(report['failures'])} over budget or unexpected status", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
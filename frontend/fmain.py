@@ -105,21 +105,43 @@ def get_current_user_role(token):
     return False
 
 def fetch_resources():
-    """Gets list of available rooms/resources."""
+    """Gets list of available rooms/resources (revalidated with the ETag, so reruns are cheap)."""
+    cached = st.session_state.get("resources_cache")
+    headers = get_headers()
+    if cached:
+        headers["If-None-Match"] = cached["etag"]
     try:
-        res = requests.get(f"{API_URL}/resources/", headers=get_headers())
-        return res.json() if res.status_code == 200 else []
-    except:
+        res = requests.get(f"{API_URL}/resources/", headers=headers)
+        if res.status_code == 304 and cached:
+            return cached["data"]
+        if res.status_code == 200:
+            data = res.json()
+            if res.headers.get("ETag"):
+                st.session_state.resources_cache = {"etag": res.headers["ETag"], "data": data}
+            return data
         return []
+    except:
+        return cached["data"] if cached else []
 
 def fetch_my_bookings():
     """Gets the logged-in user's bookings."""
     try:
-        res = requests.get(f"{API_URL}/bookings/", headers=get_headers())
+        # Only the columns shown below (requests sends Accept-Encoding: gzip by default)
+        res = requests.get(
+            f"{API_URL}/bookings/", params={"fields": "resource_id,start_time,end_time,status"}, headers=get_headers()
+        )
         return res.json() if res.status_code == 200 else []
     except:
         return []
 
+def fetch_bookings_export():
+    """Downloads the user's complete booking history as CSV."""
+    try:
+        res = requests.get(f"{API_URL}/bookings/export", params={"format": "csv"}, headers=get_headers())
+        return res.content if res.status_code == 200 else b""
+    except:
+        return b""
+
 def book_resource(resource_id, start_dt, end_dt):
     """Sends a booking request."""
     payload = {
@@ -206,6 +228,7 @@ else:
         if st.button("🚪 Leave the Lab (Logout)", use_container_width=True):
             st.session_state.token = None
             st.session_state.is_admin = False
+            st.session_state.pop("export_csv", None)
             st.rerun()
 
     if page == "Book a Room":
@@ -252,16 +275,20 @@ else:
             st.dataframe(df[valid_cols], width=1000) 
 
             # --- THE EXPORT FEATURE ---
+            # Full history, streamed as CSV by the API (not just the 100 rows shown above)
+            # Fetched on click only: every rerun of this page would download it again
             st.markdown("---")
-            csv = df[valid_cols].to_csv(index=False).encode('utf-8')
-            
-            st.download_button(
-                label="🩸 Export Evidence (CSV)",
-                data=csv,
-                file_name=f"forensic_report_{datetime.date.today()}.csv",
-                mime="text/csv",
-                help="Download your booking history for forensic analysis."
-            )
+            if st.button("🧪 Prepare Evidence Export"):
+                st.session_state.export_csv = fetch_bookings_export()
+
+            if st.session_state.get("export_csv"):
+                st.download_button(
+                    label="🩸 Export Evidence (CSV)",
+                    data=st.session_state.export_csv,
+                    file_name=f"forensic_report_{datetime.date.today()}.csv",
+                    mime="text/csv",
+                    help="Download your booking history for forensic analysis."
+                )
         else:
             st.info("No evidence found in the logs.")
 